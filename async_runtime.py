@@ -0,0 +1,195 @@
+import asyncio
+import os
+import stat
+import sys
+
+from model_cache import load_model
+from scheduler import ScheduleError, compile_week_schedule
+from tick_stats import TickStats
+
+# Hosts many Controllers in one process on one asyncio loop: every controller
+# is a task that advances on absolute monotonic deadlines (start + step * tick),
+# so processing time never accumulates as drift. Commands (program switches)
+# go into each controller's CommandChannel from any input: the keyboard/stdin
+# reader, the TCP command server, the state stream or the day / week plan
+# scheduler task; the controller drains them at the start of its next step.
+#
+# Command lines (stdin and TCP): "<intersection> <program or 1-based index>",
+# e.g. "311 STP_(1-5-4)" or "311 2"; "list" prints the hosted intersections.
+
+
+def load_week_schedule(data, name):
+    # The model's week schedule; a Schaltuhr that cannot be compiled is
+    # reported and not used, so the runtime keeps running without it
+    try:
+        return compile_week_schedule(data)
+    except ScheduleError as error:
+        print(f"\U0000274C {name}: Schaltuhr not used, programs change on request only: {error}")
+        return []
+
+
+class ControllerRuntime:
+    def __init__(self, tick=1.0):
+        self.tick = tick  # [s] wall-clock duration of one controller step
+        self.controllers = {}  # name -> Controller
+        self.tasks = []
+        self.stats = TickStats(tick)  # Shared by all hosted controllers
+
+    def add(self, controller, name=None):
+        name = name or controller.name
+        if name in self.controllers:
+            name = f"{name}#{len(self.controllers)}"
+        self.controllers[name] = controller
+        controller.tick_stats = self.stats
+        return name
+
+    def submit(self, name, command, source=None):
+        # Non-blocking and thread-safe; applied at the start of the controller's next step
+        kind, program = command
+        self.controllers[name].commands.push(kind, program, source=source)
+
+    async def run_controller(self, name, seconds=None):
+        controller = self.controllers[name]
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        first_step = controller.step + 1
+        step = first_step
+        while seconds is None or step < first_step + seconds:
+            deadline = start + (step - first_step + 1) * self.tick
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            woke = loop.time()
+            controller.advance(step)
+            self.stats.record_tick(deadline, woke, loop.time(), source=name)
+            step += 1
+
+    def handle_line(self, line):
+        # One text command; returns the reply text
+        parts = line.split()
+        if not parts:
+            return ""
+        if parts[0] == 'list':
+            return "\n".join(f"{name}: {controller.current_program}" for name, controller in self.controllers.items())
+        if len(parts) != 2 or parts[0] not in self.controllers:
+            return f"\U0000274C Unknown command: {line.strip()}"
+        name, program = parts
+        controller = self.controllers[name]
+        if program.isdigit() and 0 < int(program) <= len(controller.program_names):
+            program = controller.program_names[int(program) - 1]
+        if program not in controller.programs:
+            return f"\U0000274C Program '{program}' not found"
+        self.submit(name, ('switch', program), source='command')
+        return f"\U00002713 {name}: switch to {program} requested"
+
+    async def read_stdin(self):
+        # Keyboard input without a thread: stdin registered with the event loop
+        if sys.stdin is None or not (sys.stdin.isatty() or stat.S_ISFIFO(os.fstat(sys.stdin.fileno()).st_mode)):
+            return  # Only terminals and pipes can be polled by the event loop
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            reply = self.handle_line(line.decode(errors='replace'))
+            if reply:
+                print(reply)
+
+    async def serve_commands(self, host='127.0.0.1', port=8311):
+        # Network command input: one command per line, one reply per line
+        async def handle(reader, writer):
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write((self.handle_line(line.decode(errors='replace')) + "\n").encode())
+                await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def run_scheduler(self, scheduler):
+        # Day / week plans of all hosted controllers: one heap check per tick,
+        # due switching points become switch commands
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        step = 1
+        while True:
+            delay = start + step * self.tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scheduler.advance(step)
+            step += 1
+
+    def schedule(self, scheduler, schedule=None):
+        # Adds every hosted controller to the scheduler, with `schedule` or
+        # otherwise the week schedule of its own model; True if any has
+        # switching points
+        added = False
+        schedules = {}  # id(model) -> week schedule
+        for name, controller in self.controllers.items():
+            if schedule is None and id(controller.data) not in schedules:
+                schedules[id(controller.data)] = load_week_schedule(controller.data, name)
+            points = schedule if schedule is not None else schedules[id(controller.data)]
+            added = scheduler.add(name, points, lambda program, name=name: self.submit(name, ('switch', program), source='scheduler'),
+                                  step=controller.step) or added
+        return added
+
+    async def run(self, seconds=None, inputs=()):
+        # Runs all controllers (and the given input coroutines) until the
+        # controllers are done; the inputs are cancelled afterwards
+        input_tasks = [asyncio.ensure_future(coroutine) for coroutine in inputs]
+        self.tasks = [asyncio.ensure_future(self.run_controller(name, seconds)) for name in self.controllers]
+        try:
+            await asyncio.gather(*self.tasks)
+        finally:
+            for task in input_tasks:
+                task.cancel()
+            await asyncio.gather(*input_tasks, return_exceptions=True)
+
+
+if __name__ == '__main__':
+    # python async_runtime.py [COUNT] [--seconds N] [--port P] [--tick S] [--gui] [--stream P]
+    from main import Controller
+    from scheduler import SwitchScheduler, program_at
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 1
+    seconds = int(sys.argv[sys.argv.index('--seconds') + 1]) if '--seconds' in sys.argv else None
+    port = int(sys.argv[sys.argv.index('--port') + 1]) if '--port' in sys.argv else 8311
+    tick = float(sys.argv[sys.argv.index('--tick') + 1]) if '--tick' in sys.argv else 1.0
+
+    data = load_model('z1_fg311.xml')
+    runtime = ControllerRuntime(tick=tick)
+    schedule = load_week_schedule(data, 'z1_fg311.xml')
+    scheduler = SwitchScheduler()
+    for i in range(count):
+        controller = Controller(data, gui=False, start_program=program_at(schedule, scheduler.start_second))
+        controller.verbose = count == 1
+        runtime.add(controller, name=controller.name if count == 1 else f"{controller.name}-{i + 1}")
+    
+    if '--gui' in sys.argv:
+        # One dashboard window (one Tk thread) for every hosted intersection
+        from signal_vis import SignalDashboard
+        dashboard = SignalDashboard(title="Signals")
+        for name, controller in runtime.controllers.items():
+            dashboard.add_intersection(name, controller.bus)
+        dashboard.start()
+
+    print(f"\U00002713 Hosting {count} intersection(s), tick {tick}s, commands on stdin and port {port}")
+    inputs = [runtime.read_stdin(), runtime.serve_commands(port=port)]
+    if '--stream' in sys.argv:
+        # Live state frames to remote subscribers (state_stream.py is also the stand-in client)
+        from state_stream import StateStreamServer
+        inputs.append(StateStreamServer(runtime).serve(port=int(sys.argv[sys.argv.index('--stream') + 1])))
+    if runtime.schedule(scheduler, schedule):
+        print(f"\U0001F4C5 Week plan: {len(schedule)} switching points per intersection")
+        inputs.append(runtime.run_scheduler(scheduler))
+    try:
+        asyncio.run(runtime.run(seconds, inputs=inputs))
+    except KeyboardInterrupt:
+        pass
+    print(runtime.stats.report())
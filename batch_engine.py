@@ -0,0 +1,188 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from main import parse_stage_sequence
+from model_cache import load_model
+from transitions import compile_transition
+
+
+class BatchEngine:
+    # Steps N intersections in lock-step with the same stage/transition
+    # semantics as Controller.advance, holding all state as NumPy arrays.
+    #
+    # Every signal picture an intersection can show (a stage, or one second of
+    # a compiled transition) is a row in one global frame table, so the state
+    # of all intersections after a step is a single gather: frames[row].
+    def __init__(self, datasets, start_programs=None, stage_duration=60):
+        if np is None:
+            raise ImportError("BatchEngine requires NumPy")
+
+        self.datasets = datasets
+        self.n = len(datasets)
+        self.stage_duration = stage_duration
+        self.switch_window_start = int(stage_duration * 0.90)
+        self.signals = [data['signals'] for data in datasets]
+        self.program_names = [list(data['programs'].keys()) for data in datasets]
+
+        n = self.n
+        max_signals = max((len(s) for s in self.signals), default=0)
+        max_stages = max((len(data['stages']) for data in datasets), default=0)
+        max_programs = max((len(p) for p in self.program_names), default=0)
+        sequences = [
+            [parse_stage_sequence(name, len(data['stages'])) for name in names]
+            for data, names in zip(datasets, self.program_names)
+        ]
+        max_sequence = max((len(seq) for seqs in sequences for seq in seqs), default=0)
+
+        self.seq = np.zeros((n, max_programs, max_sequence), dtype=np.int16)
+        self.seq_len = np.ones((n, max_programs), dtype=np.int16)
+        for i, seqs in enumerate(sequences):
+            for p, seq in enumerate(seqs):
+                self.seq[i, p, :len(seq)] = seq
+                self.seq_len[i, p] = len(seq)
+
+        frames = []
+        self.stage_row = np.zeros((n, max_stages), dtype=np.int32)
+        for i, data in enumerate(datasets):
+            for stage_idx, stage_state in enumerate(data['stage_states']):
+                self.stage_row[i, stage_idx] = len(frames)
+                frames.append(self._pad(stage_state, max_signals))
+
+        # Only pairs the engine can reach: consecutive stages of every program,
+        # and any stage of one program into the second stage of another (switch)
+        self.pair_row = np.full((n, max_stages, max_stages), -1, dtype=np.int32)
+        self.pair_duration = np.zeros((n, max_stages, max_stages), dtype=np.int32)
+        for i, (data, seqs) in enumerate(zip(datasets, sequences)):
+            for from_idx, to_idx in self._reachable_pairs(seqs):
+                transition = data['transition_table'].get((from_idx, to_idx))
+                if transition is None:
+                    transition = compile_transition(data, from_idx, to_idx, allowed=False)
+                self.pair_row[i, from_idx, to_idx] = len(frames)
+                self.pair_duration[i, from_idx, to_idx] = transition['duration']
+                frames.extend(self._transition_frames(data, transition, max_signals))
+
+        self.frames = np.array(frames, dtype=np.uint8).reshape(len(frames), max_signals)
+
+        # Struct-of-arrays controller state
+        self.program = np.zeros(n, dtype=np.int16)
+        if start_programs is not None:
+            for i, name in enumerate(start_programs):
+                if name is not None:
+                    self.program[i] = self.program_names[i].index(name)
+        self.pending_program = np.full(n, -1, dtype=np.int16)
+        self.stage_pos = np.zeros(n, dtype=np.int16)
+        self.stage = self.seq[np.arange(n), self.program, 0].astype(np.int16)
+        self.next_pos = self.stage_pos.copy()
+        self.next_stage = self.stage.copy()
+        self.time_in_stage = np.zeros(n, dtype=np.int32)
+        self.in_transition = np.zeros(n, dtype=bool)
+        self.transition_elapsed = np.zeros(n, dtype=np.int32)
+        self.transition_duration = np.zeros(n, dtype=np.int32)
+        self.transition_row = np.zeros(n, dtype=np.int32)
+        self.step = 0
+
+        self._index = np.arange(n)
+        self.row = self.stage_row[self._index, self.stage]
+        self.state = self.frames[self.row]
+
+    @classmethod
+    def from_files(cls, file_paths, **kwargs):
+        return cls([load_model(path) for path in file_paths], **kwargs)
+
+    @staticmethod
+    def _pad(stage_state, width):
+        return list(stage_state) + [0] * (width - len(stage_state))
+
+    @staticmethod
+    def _reachable_pairs(sequences):
+        pairs = set()
+        for seq in sequences:
+            for pos, stage in enumerate(seq):
+                pairs.add((stage, seq[(pos + 1) % len(seq)]))
+        for seq in sequences:
+            for other in sequences:
+                if other is seq:
+                    continue
+                target = other[1 % len(other)]
+                for stage in seq:
+                    pairs.add((stage, target))
+        return sorted(pairs)
+
+    def _transition_frames(self, data, transition, width):
+        # One full signal picture per second of the transition, as replayed
+        # by Controller._replay_transition
+        state = self._pad(data['stage_states'][transition['from']], width)
+        schedule = transition['schedule']
+        pos = 0
+        rows = []
+        for offset in range(transition['duration']):
+            while pos < len(schedule) and schedule[pos][0] <= offset:
+                _, slot, code = schedule[pos]
+                state[slot] = code
+                pos += 1
+            rows.append(list(state))
+        return rows
+
+    def request_program_switch(self, i, program_name):
+        program = self.program_names[i].index(program_name)
+        if program == self.program[i]:
+            return False
+        self.pending_program[i] = program
+        return True
+
+    def advance(self):
+        self.step += 1
+        idx = self._index
+        was_in_transition = self.in_transition
+
+        # Transitions in progress: one second further, finish those that are done
+        self.transition_elapsed += was_in_transition
+        finished = was_in_transition & (self.transition_elapsed >= self.transition_duration)
+        if finished.any():
+            self.stage_pos = np.where(finished, self.next_pos, self.stage_pos)
+            self.stage = np.where(finished, self.next_stage, self.stage)
+            self.time_in_stage[finished] = 0
+            self.in_transition = was_in_transition & ~finished
+
+        # Stages running: count up, start transitions at the end of the stage
+        idle = ~was_in_transition
+        self.time_in_stage += idle
+        starting = idle & (self.time_in_stage >= self.stage_duration)
+        if starting.any():
+            switching = starting & (self.pending_program >= 0)
+            if switching.any():
+                self.program = np.where(switching, self.pending_program, self.program)
+                self.stage_pos = np.where(switching, 0, self.stage_pos)
+                self.pending_program = np.where(switching, -1, self.pending_program)
+            next_pos = (self.stage_pos + 1) % self.seq_len[idx, self.program]
+            next_stage = self.seq[idx, self.program, next_pos]
+            self.next_pos = np.where(starting, next_pos, self.next_pos)
+            self.next_stage = np.where(starting, next_stage, self.next_stage)
+            self.transition_row = np.where(starting, self.pair_row[idx, self.stage, next_stage], self.transition_row)
+            self.transition_duration = np.where(starting, self.pair_duration[idx, self.stage, next_stage], self.transition_duration)
+            self.transition_elapsed[starting] = 0
+            self.in_transition = self.in_transition | starting
+
+            # Transitions without timed changes (e.g. into the same stage)
+            # complete in the step they start, as in the Controller
+            instant = starting & (self.transition_duration == 0)
+            if instant.any():
+                self.stage_pos = np.where(instant, self.next_pos, self.stage_pos)
+                self.stage = np.where(instant, self.next_stage, self.stage)
+                self.time_in_stage[instant] = 0
+                self.in_transition = self.in_transition & ~instant
+
+        self.row = np.where(self.in_transition, self.transition_row + self.transition_elapsed, self.stage_row[idx, self.stage])
+        self.state = self.frames[self.row]
+        return self.state
+
+    def run(self, steps, record=False):
+        # Returns the states of all intersections per step, [steps, N, signals]
+        history = np.empty((steps,) + self.state.shape, dtype=np.uint8) if record else None
+        for k in range(steps):
+            state = self.advance()
+            if record:
+                history[k] = state
+        return history
@@ -0,0 +1,292 @@
+import copy
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from model_cache import load_model
+from xml_parser import NS, parse_xml
+
+# Reproducible performance measurements of the controller stack:
+#   load       - parse_xml of the export, and load_model from the cache
+#   ticks      - simulated steps per second (stage, plan and actuated mode)
+#   transitions - compiled stage transitions per second, and stage changes
+#                 per second when every stage lasts one step
+#   memory     - peak allocation while loading and simulating one day
+#   gui        - cost of one dashboard frame (refresh + Tk redraw), when a
+#                display is available
+# Inputs are z1_fg311.xml and synthetic exports made from it with every signal
+# group (and its detectors, conflicts and intergreens) copied SCALE times.
+# Every timing is repeated until it has run for MIN_TIME seconds (at least
+# MIN_RUNS times) and the median is kept, with the relative spread of the runs
+# as the metric's noise. Results are written as JSON; against a stored
+# baseline, a metric is flagged as a regression when it got worse by more
+# than the threshold and by more than NOISE_FACTOR times the noise of either
+# run, so jitter on sub-millisecond work is not reported.
+
+SIGNAL_REFERENCES = {'ZugeordneteSignalgruppe', 'Signalgruppe', 'Bezeichnung', 'SgrBezeichnung',
+                     'SGr1', 'SGr2', 'Raeumer', 'Einfahrer'}
+HIGHER_IS_BETTER = ('_per_s',)  # Metric name suffixes; everything else is a time or size
+MIN_TIME = 0.5  # Seconds each timing is repeated for
+MIN_RUNS = 5
+NOISE_FACTOR = 2
+
+
+def synthetic_export(xml_path, scale, out_path):
+    # Copies every element that names a signal group scale - 1 times, with
+    # the signal group (and detector) names suffixed: the same stages and
+    # programs, scale times the signal groups
+    ET.register_namespace('', NS[1:-1])
+    tree = ET.parse(xml_path)
+    root = tree.getroot()
+    signals = {group.findtext(NS + 'Bezeichnung') for group in root.iter(NS + 'Signalgruppe')
+               if group.find(NS + 'Bezeichnung') is not None}
+    signals.discard(None)
+    parents = {child: parent for parent in root.iter() for child in parent}
+
+    owners = [element for element in root.iter()
+              if any(child.tag[len(NS):] in SIGNAL_REFERENCES and (child.text or '').strip() in signals for child in element)]
+    for element in owners:
+        parent = parents[element]
+        position = list(parent).index(element)
+        for k in range(2, scale + 1):
+            duplicate = copy.deepcopy(element)
+            for node in duplicate.iter():
+                text = (node.text or '').strip()
+                if text in signals or (node is not duplicate and node.tag == NS + 'Bezeichnung' and element.tag == NS + 'DigEingang'):
+                    node.text = f"{text}_{k}"
+            position += 1
+            parent.insert(position, duplicate)
+    tree.write(out_path, encoding='utf-8', xml_declaration=True)
+    return out_path
+
+
+def _median(times, noise, name):
+    # Median of the run times; their interquartile range relative to the
+    # median goes to noise[name]
+    times = sorted(times)
+    n = len(times)
+    median = times[n // 2] if n % 2 else (times[n // 2 - 1] + times[n // 2]) / 2
+    noise[name] = (times[(3 * n) // 4] - times[n // 4]) / median if median else 0.0
+    return median
+
+
+def _measure(function, noise, name):
+    # Median seconds per call, over at least MIN_RUNS calls and MIN_TIME
+    # seconds, after one warm-up call; garbage is collected between calls so
+    # no run pays for the previous one's
+    function()
+    times = []
+    total = 0.0
+    while total < MIN_TIME or len(times) < MIN_RUNS:
+        gc.collect()
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        times.append(elapsed)
+        total += elapsed
+    return _median(times, noise, name)
+
+
+def bench_load(xml_path, workdir, noise):
+    cache_path = os.path.join(workdir, os.path.basename(xml_path) + '.cache')
+    load_model(xml_path, cache_path)
+    return {
+        'parse_ms': _measure(lambda: parse_xml(xml_path), noise, 'parse_ms') * 1e3,
+        'cached_load_ms': _measure(lambda: load_model(xml_path, cache_path), noise, 'cached_load_ms') * 1e3,
+    }
+
+
+def bench_ticks(data, seconds, noise):
+    from main import Controller
+    from detectors import DetectorInput, SimulatedDetectorSource
+
+    def run(name, mode, actuated=False):
+        def simulate():
+            detector_input = DetectorInput(data['detectors']) if actuated else None
+            controller = Controller(data, gui=False, mode=mode, detector_input=detector_input,
+                                    actuated=True if actuated else None)
+            source = SimulatedDetectorSource(detector_input, {d['name']: 0.1 for d in data['detectors']}, seed=311) if actuated else None
+            controller.simulate(seconds, on_step=source.push_step if source else None)
+        return seconds / _measure(simulate, noise, name)
+
+    results = {'stage_ticks_per_s': run('stage_ticks_per_s', 'stages'),
+               'actuated_ticks_per_s': run('actuated_ticks_per_s', 'stages', actuated=True)}
+    if data.get('signal_plans'):
+        results['plan_ticks_per_s'] = run('plan_ticks_per_s', 'plan')
+    return results
+
+
+def bench_transitions(data, seconds, noise):
+    from main import Controller
+    from transitions import compile_transition
+
+    pairs = [(a, b) for a in range(len(data['stages'])) for b in range(len(data['stages'])) if a != b]
+    compiled = len(pairs) / _measure(lambda: [compile_transition(data, a, b) for a, b in pairs],
+                                     noise, 'compiled_transitions_per_s')
+
+    def one_step_stages():
+        # Every stage lasts one step: the run is almost only transitions
+        controller = Controller(data, gui=False)
+        controller.stage_duration = 1
+        controller.switch_window_start = 0
+        starts = [0]
+
+        def count(step):
+            starts[0] += not controller.in_transition
+        controller.simulate(seconds, on_step=count)
+        return starts[0]
+
+    changes = []
+    elapsed = _measure(lambda: changes.append(one_step_stages()), noise, 'stage_changes_per_s')
+    return {'compiled_transitions_per_s': compiled, 'stage_changes_per_s': changes[-1] / elapsed}
+
+
+def bench_memory(xml_path, seconds):
+    from main import Controller
+    tracemalloc.start()
+    try:
+        data = parse_xml(xml_path)
+        Controller(data, gui=False).simulate(seconds)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'peak_memory_kb': peak / 1024}
+
+
+def bench_gui(data, noise, frames=300, window=None):
+    # Average cost of one dashboard frame while the signals change every step
+    from main import Controller
+    from signal_vis import SignalDashboard
+    import tkinter as tk
+
+    own_window = window is None
+    if own_window:
+        try:
+            window = tk.Tk()
+        except tk.TclError:
+            return {}  # No display
+    controller = Controller(data, gui=False)
+    controller.verbose = False
+    controller.stage_duration = 1
+    controller.switch_window_start = 0
+    dashboard = SignalDashboard(title="Benchmark")
+    dashboard.add_intersection(controller.name, controller.bus)
+    dashboard.build(window)
+    chunks = [0.0] * MIN_RUNS  # Mean frame cost per chunk of frames
+    for step in range(1, frames + 1):
+        controller.advance(step)
+        started = time.perf_counter()
+        dashboard.refresh()
+        window.update_idletasks()
+        chunks[step * MIN_RUNS // (frames + 1)] += (time.perf_counter() - started) / (frames // MIN_RUNS)
+    if own_window:
+        window.destroy()
+    return {'gui_frame_us': _median(chunks, noise, 'gui_frame_us') * 1e6}
+
+
+def run_benchmarks(xml_path, scales=(1, 4, 16), seconds=24 * 3600, gui=True):
+    results = {}
+    noise = {}
+    with tempfile.TemporaryDirectory(prefix='vsc_bench_') as workdir:
+        for scale in scales:
+            _run_scale(xml_path, scale, seconds, gui, workdir, results, noise)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds': seconds,
+        },
+        'results': results,
+        'noise': noise,  # Relative spread per metric; missing = deterministic
+    }
+
+
+def _run_scale(xml_path, scale, seconds, gui, workdir, results, noise):
+    path = xml_path if scale == 1 else synthetic_export(xml_path, scale, os.path.join(workdir, f"x{scale}.xml"))
+    data = parse_xml(path)
+    prefix = f"x{scale}"
+    print(f"{prefix}: {len(data['signals'])} signal groups, {len(data['stages'])} stages, {len(data['programs'])} STPs")
+    metrics = {}
+    spread = {}
+    metrics.update(bench_load(path, workdir, spread))
+    metrics.update(bench_ticks(data, seconds, spread))
+    metrics.update(bench_transitions(data, seconds // 10, spread))
+    metrics.update(bench_memory(path, seconds))
+    if gui:
+        frame = bench_gui(data, spread)
+        if not frame:
+            print("  GUI frame cost skipped: no display")
+        metrics.update(frame)
+    for name, value in metrics.items():
+        results[f"{prefix}.{name}"] = value
+        if name in spread:
+            noise[f"{prefix}.{name}"] = spread[name]
+            print(f"  {name:28s} {value:14,.1f}  ±{spread[name]:.0%}")
+        else:
+            print(f"  {name:28s} {value:14,.1f}")
+
+
+def compare(results, baseline, threshold=0.10):
+    # [(metric, baseline value, value, relative change)] of the regressions:
+    # worse by more than the threshold and than NOISE_FACTOR times the noise
+    # measured in either run
+    regressions = []
+    for name, value in results['results'].items():
+        old = baseline['results'].get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        noise = max(results.get('noise', {}).get(name, 0.0), baseline.get('noise', {}).get(name, 0.0))
+        if worse > max(threshold, NOISE_FACTOR * noise):
+            regressions.append((name, old, value, change))
+    return regressions
+
+
+def check_baseline(results, baseline_path, threshold=0.10):
+    # Prints the regressions against a stored result file; returns their count
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    for key in ('python', 'seconds'):
+        if baseline['meta'].get(key) != results['meta'][key]:
+            print(f"\U000026A0  Baseline {key} differs: {baseline['meta'].get(key)} (this run: {results['meta'][key]})")
+    regressions = compare(results, baseline, threshold)
+    for name, old, value, change in regressions:
+        print(f"\U0000274C {name}: {old:,.1f} → {value:,.1f} ({change:+.0%})")
+    if not regressions:
+        print(f"\U00002713 No regressions beyond {threshold:.0%} or the measured noise")
+    return len(regressions)
+
+
+def write_results(results, file_path):
+    with open(file_path, 'w', encoding='utf-8') as out_file:
+        json.dump(results, out_file, indent=2)
+    print(f"\U00002713 Results written to {file_path}")
+
+
+if __name__ == '__main__':
+    # python benchmark.py [z1_fg311.xml] [--scale 1 4 16] [--seconds N] [--out bench.json]
+    #                     [--baseline bench_baseline.json] [--threshold 0.1] [--no-gui]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Virtual Signal Controller benchmarks")
+    parser.add_argument('xml', nargs='?', default='z1_fg311.xml')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--seconds', type=int, default=24 * 3600)
+    parser.add_argument('--out', default='bench.json')
+    parser.add_argument('--baseline')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    parser.add_argument('--no-gui', dest='gui', action='store_false')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.xml, args.scale, args.seconds, args.gui)
+    write_results(results, args.out)
+    if args.baseline and check_baseline(results, args.baseline, args.threshold):
+        sys.exit(1)
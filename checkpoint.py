@@ -0,0 +1,112 @@
+import hashlib
+import os
+import pickle
+import time
+from array import array
+
+from conflict_monitor import ConflictMonitor
+
+# Controller checkpoints for warm restarts and what-if forks.
+# Layout: MAGIC, 16-byte digest of the intersection layout (signals, programs,
+# stages), pickled dict of the controller's run-time fields. The parsed model
+# is not part of a checkpoint: it comes from the (cached) XML on restore, so a
+# checkpoint is a few hundred bytes and restores in well under a millisecond.
+# Bump CHECKPOINT_VERSION whenever FIELDS or their meaning change.
+CHECKPOINT_VERSION = 1
+MAGIC = b'VSCK' + bytes([CHECKPOINT_VERSION])
+DIGEST_SIZE = 16
+
+FIELDS = [
+    'step', 'current_program', 'mode', 'cycle_second',
+    'current_stage_index', 'time_in_stage',
+    'pending_program_switch', 'switch_requested_at_step', 'switch_requested_step', 'switch_history',
+    'in_transition', 'transition_phase', 'transition_time_remaining', 'next_stage_idx', 'next_stage_index',
+    'transition', 'transition_elapsed', 'transition_event_pos',
+    'fault',
+]
+ACTUATION_FIELDS = ['demand', 'gap', 'last_vehicle']
+
+MAX_CATCH_UP = 24 * 3600  # [s] longer outages restart the schedule where it stopped
+
+
+class CheckpointError(ValueError):
+    pass
+
+
+def layout_digest(data):
+    layout = (list(data['signals']), list(data['programs']), [stage['name'] for stage in data['stages']])
+    return hashlib.blake2b(repr(layout).encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def checkpoint(controller):
+    fields = {name: getattr(controller, name) for name in FIELDS}
+    fields['state'] = bytes(controller.state)
+    fields['wall_time'] = time.time()
+    if controller.actuation is not None:
+        fields['actuation'] = {name: getattr(controller.actuation, name) for name in ACTUATION_FIELDS}
+    return MAGIC + layout_digest(controller.data) + pickle.dumps(fields, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def restore(controller, blob, realign=False):
+    # Puts `controller` (built from the same model, in the same stages / plan
+    # mode) into the checkpointed state. realign=True then advances it,
+    # without output, by the wall-clock seconds since the checkpoint was
+    # taken; returns the steps caught up.
+    if blob[:len(MAGIC)] != MAGIC:
+        raise CheckpointError(f"Not a version {CHECKPOINT_VERSION} controller checkpoint")
+    if blob[len(MAGIC):len(MAGIC) + DIGEST_SIZE] != layout_digest(controller.data):
+        raise CheckpointError("Checkpoint was taken for a different intersection layout")
+    fields = pickle.loads(blob[len(MAGIC) + DIGEST_SIZE:])
+    if fields['mode'] != controller.mode:
+        raise CheckpointError(f"Checkpoint was taken in {fields['mode']} mode, the controller runs in {controller.mode} mode")
+
+    for name in FIELDS:
+        setattr(controller, name, fields[name])
+    controller.switch_history = list(controller.switch_history)
+    controller.active_stages = controller.stage_sequences[controller.current_program]
+    controller.plan = controller.plans[controller.current_program] if controller.mode == 'plan' else None
+    controller.state = array('B', fields['state'])
+    if controller.actuation is not None and 'actuation' in fields:
+        for name, values in fields['actuation'].items():
+            setattr(controller.actuation, name, list(values))
+    if controller.on_conflict and controller.fault is None and 'conflict_masks' in controller.data:
+        controller.monitor = ConflictMonitor(controller.data, controller.state)
+    controller.state_changed = True
+    controller.publish_state()
+
+    if not realign:
+        return 0
+    steps = min(max(0, int(time.time() - fields['wall_time'])), MAX_CATCH_UP)
+    verbose = controller.verbose
+    controller.verbose = False
+    try:
+        for step in range(controller.step + 1, controller.step + steps + 1):
+            controller.advance(step)
+    finally:
+        controller.verbose = verbose
+    return steps
+
+
+def fork(blob, data, count, **kwargs):
+    # `count` independent headless controllers, all starting from one checkpoint
+    from main import Controller
+    controllers = []
+    for _ in range(count):
+        controller = Controller(data, gui=False, **kwargs)
+        restore(controller, blob)
+        controllers.append(controller)
+    return controllers
+
+
+def write_checkpoint(controller, file_path):
+    blob = checkpoint(controller)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as checkpoint_file:
+        checkpoint_file.write(blob)
+    os.replace(tmp_path, file_path)  # A crash never leaves a half-written checkpoint
+    return len(blob)
+
+
+def read_checkpoint(file_path):
+    with open(file_path, 'rb') as checkpoint_file:
+        return checkpoint_file.read()
@@ -0,0 +1,113 @@
+import argparse
+import sys
+import time
+
+# Command-line entry point:
+#   python cli.py run       [--xml X] [--seconds N] [--no-gui] [--plan] [--actuated RATE] [--log P] [--checkpoint P] [--quiet]
+#   python cli.py simulate  [--xml X] [--seconds N] [--program P ...] [--plan] [--actuated RATE] [--log P] [--out-dir D]
+#   python cli.py verify    [--xml X] [--processes N]
+#   python cli.py bench     [--xml X] [--seconds N] [--scale 1 4 16] [--out F] [--baseline F] [--no-gui]
+# Only what a subcommand needs is imported, and Tkinter only for a GUI run,
+# so headless jobs and worker processes start without GUI or NumPy imports.
+
+
+def _load(args):
+    from model_cache import load_model
+    started = time.perf_counter()
+    data = load_model(args.xml)
+    print(f"\U00002713 {args.xml}: {len(data['stages'])} stages, {len(data['programs'])} STPs "
+          f"({(time.perf_counter() - started) * 1e3:.1f}ms)")
+    return data
+
+
+def run(args):
+    from checkpoint import CheckpointError
+    from main import run_live
+    from scheduler import ScheduleError
+    try:
+        run_live(_load(args), seconds=args.seconds, mode='plan' if args.plan else 'stages', rate=args.actuated,
+                 log_path=args.log, checkpoint_path=args.checkpoint, gui=args.gui, verbose=not args.quiet, tick=args.tick)
+    except ScheduleError as error:
+        print(f"\U0000274C Schaltuhr: {error}")
+        return 2
+    except CheckpointError as error:
+        print(f"\U0000274C {args.checkpoint}: {error}")
+        return 2
+    return 0
+
+
+def simulate(args):
+    from main import run_headless
+    data = _load(args)
+    unknown = [program for program in args.program or [] if program not in data['programs']]
+    if unknown:
+        print(f"\U0000274C Unknown program(s): {', '.join(unknown)}")
+        return 2
+    run_headless(data, seconds=args.seconds, programs=args.program, mode='plan' if args.plan else 'stages',
+                 rate=args.actuated, log_path=args.log, out_dir=args.out_dir)
+    return 0
+
+
+def verify(args):
+    from plan_verifier import report, verify as verify_plans
+    started = time.perf_counter()
+    units, window, results = verify_plans(args.xml, args.processes)
+    return 1 if report(units, window, results, time.perf_counter() - started) else 0
+
+
+def bench(args):
+    from benchmark import check_baseline, run_benchmarks, write_results
+    results = run_benchmarks(args.xml, args.scale, args.seconds, args.gui)
+    write_results(results, args.out)
+    if args.baseline and check_baseline(results, args.baseline, args.threshold):
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="Virtual Signal Controller")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add(name, handler, help, seconds=None):
+        # --seconds only for the subcommands that run for a number of steps
+        command = commands.add_parser(name, help=help)
+        command.add_argument('--xml', default='z1_fg311.xml', help="LISA XML export")
+        if seconds is not None:
+            command.add_argument('--seconds', type=int, default=seconds, help="steps to run (1 step = 1 s)")
+        command.set_defaults(handler=handler)
+        return command
+
+    command = add('run', run, "real-time controller with GUI and keyboard", 180)
+    command.add_argument('--no-gui', dest='gui', action='store_false', help="no signal dashboard")
+    command.add_argument('--quiet', action='store_true', help="no per-step console status")
+    command.add_argument('--checkpoint', help="resume from / write checkpoints to this file")
+    command.add_argument('--tick', type=float, default=1.0, help="wall-clock seconds per step")
+
+    command = add('simulate', simulate, "headless run on a virtual clock, timelines to CSV", 7 * 24 * 3600)
+    command.add_argument('--program', action='append', help="STP to simulate (repeatable; default: all)")
+    command.add_argument('--out-dir', default='.', help="directory for timeline_<STP>.csv")
+
+    for command in (commands.choices['run'], commands.choices['simulate']):
+        command.add_argument('--plan', action='store_true', help="execute the LISA switching times")
+        command.add_argument('--actuated', type=float, metavar='RATE', help="vehicle-actuated, simulated vehicles/s per detector")
+        command.add_argument('--log', help="JSON Lines event log")
+
+    command = add('verify', verify, "offline intergreen / conflict verification of all plans")
+    command.add_argument('--processes', type=int, help="worker processes (default: all CPUs)")
+
+    command = add('bench', bench, "benchmarks, optionally compared against a baseline", 24 * 3600)
+    command.add_argument('--scale', type=int, nargs='+', default=[1, 4, 16], help="synthetic export sizes")
+    command.add_argument('--out', default='bench.json', help="JSON result file")
+    command.add_argument('--baseline', help="result file to compare against, e.g. bench_baseline.json")
+    command.add_argument('--threshold', type=float, default=0.10, help="relative change flagged as regression")
+    command.add_argument('--no-gui', dest='gui', action='store_false', help="skip the GUI frame benchmark")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import sys
+import threading
+import time
+from collections import deque
+
+from tick_stats import Histogram
+
+# Command ingestion for a controller: any number of producers (operator
+# keyboard, day/week plan scheduler, network clients, priority requests) push
+# commands from any thread; the controller drains them once per tick at the
+# start of advance(), so commands never touch controller state concurrently
+# with a step. push() only appends to a deque, which is thread-safe without a
+# lock. Every command carries timestamps, giving the request-to-effect latency:
+#   ingest - push until the control loop applied it (start of the next tick)
+#   effect - push until the program switch was executed (end of the stage or
+#            cycle, at the safe switching point)
+SWITCH = 'switch'
+
+
+class CommandChannel:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.normal = deque()
+        self.priority = deque()
+        self.ingest = Histogram()
+        self.effect = Histogram()
+        self.received = 0
+        self.rejected = 0
+        self.superseded = 0  # Accepted switches replaced by a later one before taking effect
+
+    def __bool__(self):
+        return bool(self.normal or self.priority)
+
+    def push(self, kind, argument=None, source=None, priority=False):
+        command = {'kind': kind, 'argument': argument, 'source': source, 'priority': priority,
+                   'pushed': self.clock(), 'applied': None, 'executed': None, 'accepted': None}
+        (self.priority if priority else self.normal).append(command)
+        return command
+
+    def drain(self):
+        # Everything pushed so far: ordinary commands first, then priority
+        # ones, so a priority switch is the one left pending
+        now = self.clock()
+        commands = []
+        for queue in (self.normal, self.priority):
+            while queue:
+                command = queue.popleft()
+                command['applied'] = now
+                self.ingest.record(now - command['pushed'])
+                commands.append(command)
+        self.received += len(commands)
+        return commands
+
+    def executed(self, command):
+        command['executed'] = self.clock()
+        self.effect.record(command['executed'] - command['pushed'])
+
+    def report(self):
+        lines = [
+            f"COMMANDS: {self.received} received, {self.rejected} rejected, {self.superseded} superseded",
+            f"  ingest:      {self.ingest.describe()}",
+            f"  effect:      {self.effect.describe()}",
+        ]
+        return "\n".join(lines)
+
+
+def start_keyboard(channel, program_names):
+    # Operator input on its own thread: keys 1..9 on a Windows console
+    # (msvcrt), otherwise lines on stdin with a program number or name
+    def read_keys(msvcrt):
+        while True:
+            key = msvcrt.getwch()
+            if key.isdigit() and 0 < int(key) <= len(program_names):
+                channel.push(SWITCH, program_names[int(key) - 1], source='keyboard')
+
+    def read_lines():
+        for line in sys.stdin:
+            text = line.strip()
+            if text.isdigit() and 0 < int(text) <= len(program_names):
+                text = program_names[int(text) - 1]
+            if text:
+                channel.push(SWITCH, text, source='keyboard')
+
+    try:
+        import msvcrt
+        target, args = read_keys, (msvcrt,)
+    except ImportError:
+        if sys.stdin is None or not sys.stdin.isatty():
+            return None  # No operator console
+        target, args = read_lines, ()
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,53 @@
+from signal_util import OCIT
+
+# Pictures that release traffic: any OCIT picture showing green
+# (gruen, gruenblk, gelbgruen, wbl_rotgruen, ...)
+RELEASE = [name is not None and 'gruen' in name for name in OCIT.byteToName]
+
+FLASHING_AMBER = OCIT.nameToByte['gelbblk']
+
+
+class ConflictError(RuntimeError):
+    pass
+
+
+class ConflictMonitor:
+    # Safety check against the LISA conflict matrix (Unvertraeglichkeitsmatrix):
+    # the set of slots currently releasing traffic is one integer bitmask, and
+    # every signal change is checked with a single AND against the changing
+    # slot's precompiled conflict mask, O(1) regardless of the junction size
+    def __init__(self, data, state):
+        self.signals = data['signals']
+        self.masks = data['conflict_masks']
+        self.released = 0
+        self.checks = 0
+        for slot, code in enumerate(state):
+            if RELEASE[code]:
+                self.released |= 1 << slot
+        conflicts = self.conflicting(self.released)
+        if conflicts:
+            raise ConflictError(f"Initial state releases conflicting signal groups: {conflicts}")
+
+    def check(self, slot, code):
+        # Records the change; returns the conflicting slots' bitmask (0 = safe)
+        self.checks += 1
+        bit = 1 << slot
+        if not RELEASE[code]:
+            self.released &= ~bit
+            return 0
+        violation = self.masks[slot] & self.released
+        self.released |= bit
+        return violation
+
+    def conflicting(self, released):
+        # All conflicting (signal, signal) pairs within a release bitmask
+        pairs = []
+        for slot, mask in enumerate(self.masks):
+            if released >> slot & 1:
+                for other in range(slot + 1, len(self.masks)):
+                    if mask >> other & 1 and released >> other & 1:
+                        pairs.append((self.signals[slot], self.signals[other]))
+        return pairs
+
+    def names(self, mask):
+        return [signal for slot, signal in enumerate(self.signals) if mask >> slot & 1]
@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+from collections import deque
+
+from signal_util import OCIT
+
+GREEN = OCIT.nameToByte['gruen']
+
+# LISA detector parameters: Prellzeit and BemZL (design time gap) are read as
+# tenths of a second, LoeschSekunde as seconds; 0 means "not set"
+TENTHS = 0.1
+DEFAULT_GAP_TIME = 3  # [s] gap-out when no BemZL is set
+OCCUPANCY = 0.3  # [s] loop occupancy of one simulated vehicle
+
+
+class DetectorInput:
+    # Ingestion path for detector edges from any thread (field bus reader,
+    # simulator, network). push() only appends to a deque, which is safe
+    # without a lock; the controller drains the deque once per tick, applying
+    # the debounce time per detector, so pulses never wait on the control loop.
+    def __init__(self, detectors, clock=time.monotonic):
+        self.detectors = detectors
+        self.index = {detector['name']: i for i, detector in enumerate(detectors)}
+        self.clock = clock
+        self.events = deque()
+        self.debounce = [detector['debounce'] * TENTHS for detector in detectors]
+        self.occupied = [False] * len(detectors)
+        self.released = [None] * len(detectors)  # Time the detector last went free
+        self.received = 0
+        self.bounced = 0
+
+    def push(self, detector, occupied=True, timestamp=None):
+        self.events.append((detector, occupied, self.clock() if timestamp is None else timestamp))
+
+    def pulse(self, detector, timestamp=None, occupancy=OCCUPANCY):
+        # One vehicle passing: rising and falling edge
+        timestamp = self.clock() if timestamp is None else timestamp
+        self.events.append((detector, True, timestamp))
+        self.events.append((detector, False, timestamp + occupancy))
+
+    def drain(self):
+        # Applies all queued edges; returns the detector indices that saw a
+        # vehicle since the last drain (new rising edge or still occupied)
+        seen = set()
+        events = self.events
+        while events:
+            detector, occupied, timestamp = events.popleft()
+            i = self.index.get(detector)
+            if i is None:
+                continue
+            self.received += 1
+            if occupied:
+                if self.occupied[i]:
+                    continue
+                if self.released[i] is not None and timestamp - self.released[i] < self.debounce[i]:
+                    # Rising again within the debounce time: contact bounce
+                    self.bounced += 1
+                    self.occupied[i] = True
+                    continue
+                self.occupied[i] = True
+                seen.add(i)
+            elif self.occupied[i]:
+                self.occupied[i] = False
+                self.released[i] = timestamp
+        for i, occupied in enumerate(self.occupied):
+            if occupied:
+                seen.add(i)
+        return seen
+
+
+class Actuation:
+    # Per signal group detector state for vehicle-actuated operation, updated
+    # once per tick: demand (vehicle waiting while not green) and gap (seconds
+    # since the last vehicle on any of the group's detectors)
+    def __init__(self, data, detector_input, parameter_set=None):
+        self.input = detector_input
+        n = len(data['signals'])
+        parameters = data['detector_parameters'].get(parameter_set, {})
+
+        self.detectors = [[] for _ in range(n)]  # Slot -> detector indices
+        self.gap_time = [0] * n
+        self.clear_seconds = [0] * n
+        for i, detector in enumerate(detector_input.detectors):
+            slot = data['signal_index'].get(detector['signal_group'])
+            if slot is None:
+                continue
+            self.detectors[slot].append(i)
+            gap_time = int(parameters.get(detector['name'], {}).get('BemZL') or 0) * TENTHS
+            self.gap_time[slot] = max(self.gap_time[slot], gap_time or DEFAULT_GAP_TIME)
+            self.clear_seconds[slot] = max(self.clear_seconds[slot], detector['clear_seconds'])
+
+        self.min_green = [data['signal_groups'].get(signal, {}).get('min_green', 0) for signal in data['signals']]
+        self.demand = [False] * n
+        self.gap = [0] * n
+        self.last_vehicle = [None] * n
+
+    def update(self, state, step):
+        seen = self.input.drain()
+        for slot, detectors in enumerate(self.detectors):
+            if not detectors:
+                continue
+            if any(i in seen for i in detectors):
+                self.gap[slot] = 0
+                self.last_vehicle[slot] = step
+                if state[slot] != GREEN:
+                    self.demand[slot] = True
+            else:
+                self.gap[slot] += 1
+            if state[slot] == GREEN:
+                self.demand[slot] = False
+            elif self.demand[slot] and self.clear_seconds[slot] and step - self.last_vehicle[slot] >= self.clear_seconds[slot]:
+                self.demand[slot] = False
+
+    def gapped_out(self, slots, time_in_stage):
+        # True when every detector-equipped slot in `slots` is past its minimum
+        # green and has seen no vehicle for its gap time; False for stages
+        # without detectors, which keep their fixed duration
+        actuated = [slot for slot in slots if self.detectors[slot]]
+        if not actuated:
+            return False
+        for slot in actuated:
+            if time_in_stage < self.min_green[slot] or self.gap[slot] < self.gap_time[slot]:
+                return False
+        return True
+
+    def has_demand(self, slots):
+        # Stages whose new greens have no detectors are always served
+        actuated = [slot for slot in slots if self.detectors[slot]]
+        return not actuated or any(self.demand[slot] for slot in actuated)
+
+
+class SimulatedDetectorSource:
+    # Random vehicle arrivals (Poisson, rate in vehicles per second per
+    # detector) for testing actuated control without field hardware
+    def __init__(self, detector_input, rates, seed=None):
+        self.input = detector_input
+        self.rates = rates  # detector name -> vehicles/s
+        self.random = random.Random(seed)
+        self._stop = threading.Event()
+
+    def push_step(self, step):
+        # Virtual clock: all arrivals within the second [step - 1, step)
+        for detector, rate in self.rates.items():
+            t = step - 1 + self.random.expovariate(rate) if rate > 0 else step
+            while t < step:
+                self.input.pulse(detector, timestamp=t)
+                t += self.random.expovariate(rate)
+
+    def start(self):
+        # Real time: a single thread pushing pulses as they fall due
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        total = sum(self.rates.values())
+        detectors = list(self.rates.keys())
+        weights = list(self.rates.values())
+        while total > 0 and not self._stop.wait(self.random.expovariate(total)):
+            self.input.pulse(self.random.choices(detectors, weights)[0])
@@ -0,0 +1,67 @@
+import json
+import time
+
+# Event kinds written by the Controller
+STAGE_START = 'stage_start'
+TRANSITION_PHASE = 'transition_phase'
+SIGNAL = 'signal'
+SWITCH_REQUEST = 'switch_request'
+SWITCH_EXECUTED = 'switch_executed'
+CONFLICT = 'conflict'
+
+
+class EventLog:
+    # Append-only JSON Lines log, one object per event:
+    #   {"t": 1760781234.512, "step": 61, "kind": "signal", "signal": "K1", "color": "gelb"}
+    # record() only appends a tuple to an in-memory buffer; serialisation and
+    # the write happen in batches of buffer_size records (and on flush/close),
+    # so logging costs the control loop next to nothing.
+    def __init__(self, file_path, buffer_size=4096, clock=time.time):
+        self.file_path = file_path
+        self.buffer_size = buffer_size
+        self.clock = clock
+        self.buffer = []
+        self.records = 0
+        self._file = open(file_path, mode='a', encoding='utf-8')
+
+    def record(self, kind, step, **fields):
+        self.buffer.append((self.clock(), step, kind, fields))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        lines = []
+        for t, step, kind, fields in self.buffer:
+            event = {'t': round(t, 3), 'step': step, 'kind': kind}
+            event.update(fields)
+            lines.append(dumps(event))
+        lines.append('')
+        self._file.write('\n'.join(lines))
+        self._file.flush()
+        self.records += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_events(file_path, kinds=None):
+    # Yields the logged events as dicts, optionally only the given kinds
+    with open(file_path, encoding='utf-8') as log_file:
+        for line in log_file:
+            if line.strip():
+                event = json.loads(line)
+                if kinds is None or event['kind'] in kinds:
+                    yield event
@@ -1,91 +1,84 @@
-import xml.etree.ElementTree as ET
+import os
 import time
 import sys
 import csv
-import tkinter as tk
-import threading
-import queue
 import re
-try:
-    import msvcrt
-    use_keyboard = True
-except ImportError:
-    use_keyboard = False
+from array import array
+from signal_util import OCIT
+from transitions import compile_transition, compile_state_transition
+from model_cache import load_model
+from state_bus import StateBus
+from detectors import Actuation, DetectorInput, SimulatedDetectorSource
+from tick_stats import TickStats
+from scheduler import SwitchScheduler, compile_week_schedule, program_at
+from checkpoint import read_checkpoint, restore, write_checkpoint
+from commands import CommandChannel, SWITCH, start_keyboard
+from event_log import EventLog, STAGE_START, TRANSITION_PHASE, SIGNAL, SWITCH_REQUEST, SWITCH_EXECUTED, CONFLICT
+from conflict_monitor import ConflictMonitor, ConflictError, FLASHING_AMBER
+
+ICONS = {
+    OCIT.nameToByte['gruen']: '\U0001F7E2',
+    OCIT.nameToByte['rot']: '\U0001F534',
+    OCIT.nameToByte['gelb']: '\U0001F7E1',
+    OCIT.nameToByte['dunkel']: '\U000026AB',
+    OCIT.nameToByte['rotgelb']: '\U0001F7E0',
+}
+
+GREEN = OCIT.nameToByte['gruen']
+
+PHASE_TITLES = {
+    'yellow': "\U0001F7E1 Phase 1: YELLOW (Termination)",
+    'all_red': "\U0001F534 Phase 2: ALL-RED (Clearance)",
+    'red_yellow': "\U0001F7E0 Phase 3: RED-YELLOW (Initiation)",
+}
 
-def parse_xml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    ns = {'ns': 'http://www.schlothauer.de/OMTC/LStg_Versorgung'}
-    
-    data = {
-        'stages': [],
-        'programs': {},
-        'intergreen_times': {}
-    }
-    
-    phases = root.findall('.//ns:Phase', ns)
-    for phase in phases:
-        stage_name = phase.findtext('ns:Bezeichnung', namespaces=ns)
-        signals = {}
-        
-        elements = phase.findall('ns:PhasenElementeintrag', ns)
-        for element in elements:
-            signal = element.findtext('ns:Signalgruppe', namespaces=ns)
-            state = element.findtext('ns:Signalbild', namespaces=ns)
-            if signal and state:
-                signals[signal] = state
-        
-        if signals:
-            data['stages'].append({'name': stage_name, 'signals': signals})
-    
-    programs = root.findall('.//ns:Signalprogramm', ns)
-    for program in programs:
-        name = program.findtext('ns:Bezeichnung', namespaces=ns)
-        timings = {}
-        
-        rows = program.findall('ns:SPZeile', ns)
-        for row in rows:
-            signal = row.findtext('ns:Signalgruppe', namespaces=ns)
-            if not signal:
-                continue
-            
-            switches = row.findall('ns:Schaltzeit', ns)
-            for switch in switches:
-                if switch.findtext('ns:ZielSignalbild', namespaces=ns) == 'gruen':
-                    time_point = switch.findtext('ns:Schaltzeitpunkt', namespaces=ns)
-                    if time_point:
-                        timings[signal] = int(float(time_point))
-                    break
-        
-        data['programs'][name] = timings
-    
-    matrix = root.find('.//ns:SicherheitsZwischenzeitenmatrix', ns)
-    if matrix is not None:
-        entries = matrix.findall('ns:ZwiZt', ns)
-        for entry in entries:
-            from_sig = entry.findtext('ns:Raeumer', namespaces=ns)
-            to_sig = entry.findtext('ns:Einfahrer', namespaces=ns)
-            time_val = entry.findtext('ns:T', namespaces=ns)
-            
-            if from_sig and to_sig and time_val:
-                if from_sig not in data['intergreen_times']:
-                    data['intergreen_times'][from_sig] = {}
-                data['intergreen_times'][from_sig][to_sig] = int(float(time_val))
-    
-    return data
+
+def parse_stage_sequence(program_name, stage_count):
+    # 'STP_(1-3-2)' → stage indices [0, 2, 1]; otherwise all stages in order
+    match = re.search(r'\((\d+(?:-\d+)*)\)', program_name)
+    if match:
+        return [int(x) - 1 for x in match.group(1).split('-')]
+    return list(range(stage_count))
 
 
 class Controller:
-    def __init__(self, data):
+    def __init__(self, data, gui=True, start_program=None, event_log=None, mode='stages', detector_input=None, actuated=None,
+                 on_conflict='fallback'):
         self.all_stages = data['stages']  # All 5 stages from XML
         self.programs = data['programs']
         self.intergreens = data['intergreen_times']  # Safety matrix from XML
         
         self.program_names = list(self.programs.keys())
         self.current_program = self.program_names[0] if self.program_names else None
-        
-        # Initialize signal visualization
-        self.signal_queues = {}  # Will store queues for each signal group
+        if start_program is not None:
+            if start_program not in self.programs:
+                raise ValueError(f"Program '{start_program}' not found")
+            self.current_program = start_program
+        
+        # 'stages': fixed stage_duration per stage of the STP's stage sequence
+        # 'plan': the STP's LISA switching times, cycle by cycle within its TU
+        self.mode = mode
+        self.plans = data.get('signal_plans', {})
+        self.plan = None
+        self.cycle_second = 0  # Plan mode: second within the running plan's cycle
+        if mode == 'plan':
+            if self.current_program not in self.plans:
+                raise ValueError(f"Program '{self.current_program}' has no switching times")
+            self.plan = self.plans[self.current_program]
+        elif mode != 'stages':
+            raise ValueError(f"Unknown mode '{mode}'")
+        
+        self.gui = gui
+        self.verbose = True  # Console output; switched off for headless runs
+        self.step = 0  # Virtual clock: last step passed to advance()
+        self.timeline = None  # Timeline of signal changes while recording
+        self.event_log = event_log  # Structured EventLog of stage/transition/signal/switch events
+        self.tick_stats = None  # TickStats while running in real time
+        
+        # Signal visualization: one dashboard window for all signal heads
+        self.dashboard = None
+        self.state_changed = False  # Set by _set_signal, published once per step
+        self.bus = None  # StateBus with an immutable snapshot per changed step
         
         self.stage_sequences = {}
         for prog in self.program_names:
@@ -100,39 +93,71 @@ class Controller:
         
         self.pending_program_switch = None
         self.switch_requested_at_step = None
+        self.switch_requested_step = None  # Step at which the pending switch was requested
+        self.switch_history = []  # (requested step, executed step, old program, new program)
+        # Thread-safe command input, drained at the start of every step;
+        # other threads push here instead of calling request_program_switch
+        self.commands = CommandChannel()
+        self.pending_command = None  # Accepted switch command waiting for its switching point
         
         self.in_transition = False
         self.transition_phase = None  # 'yellow', 'all_red', 'red_yellow'
         self.transition_time_remaining = 0
         self.next_stage_idx = None
-        
-        self.yellow_duration = 3  # Termination: GREEN → YELLOW → RED
-        self.red_yellow_duration = 1  # Initiation: RED → RED-YELLOW → GREEN
-        
-        if self.all_stages:
-            self.signals = list(self.all_stages[0]['signals'].keys())
-            current_stage = self.all_stages[self.active_stages[0]]
-            self.current_state = current_stage['signals'].copy()
-            
-            # Initialize visualization for each signal
-            for signal in self.signals:
-                color_switch_interval_queue, signal_wish_queue = init_signal_vis(f"Signal {signal}")
-                self.signal_queues[signal] = {
-                    'interval': color_switch_interval_queue,
-                    'wish': signal_wish_queue
-                }
-                # Set initial state
-                signal_wish_queue.put(self.current_state.get(signal, 'dunkel'))
+        self.transition = None  # Precompiled transition being replayed
+        self.transition_elapsed = 0
+        self.transition_event_pos = 0
+        
+        self.data = data
+        self.name = data.get('node', {}).get('name') or 'Intersection'
+        self.transitions = dict(data.get('transition_table', {}))  # (from, to) stage index → transition
+        
+        # Signal groups are integer slots; states are OCIT codes (OCIT_def.csv)
+        self.signals = data['signals']
+        self.signal_index = data['signal_index']
+        self.stage_states = data['stage_states']
+        self.intergreen_matrix = data['intergreen_matrix']  # [from * n + to], -1 = none
+        self.display_order = sorted(range(len(self.signals)), key=lambda slot: self.signals[slot])
+        self.stage_greens = [[slot for slot, code in enumerate(state) if code == GREEN] for state in self.stage_states]
+        
+        # Vehicle-actuated operation (stage mode): detector_input feeds an
+        # Actuation; actuated=None follows the program's VA flag
+        self.actuated = actuated
+        self.actuation = None
+        self.next_stage_index = None  # Position in active_stages the running transition leads to
+        if detector_input is not None:
+            parameter_set = data['program_info'].get(self.current_program, {}).get('detector_parameters')
+            self.actuation = Actuation(data, detector_input, parameter_set)
+        
+        if self.plan is not None:
+            self.state = array('B', self.plan['initial'])
+        elif self.all_stages:
+            self.state = array('B', self.stage_states[self.active_stages[0]])
         else:
-            self.signals = []
-            self.current_state = {}
+            self.state = array('B')
+        
+        # Conflict monitor: every signal change is checked against the LISA
+        # conflict matrix; on_conflict 'fallback' switches the junction to
+        # flashing amber, 'raise' raises ConflictError, None disables the check
+        self.on_conflict = on_conflict
+        self.fault = None  # Conflict message once in flashing amber fallback
+        self.monitor = ConflictMonitor(data, self.state) if on_conflict and 'conflict_masks' in data else None
+        
+        self.bus = StateBus(self.signals)
+        self.publish_state()
+        if self.gui and self.all_stages:
+            from signal_vis import SignalDashboard  # Tkinter only loads when a GUI is wanted
+            self.dashboard = SignalDashboard(title=f"Signals {self.name}")
+            self.dashboard.add_intersection(self.name, self.bus)
+            self.dashboard.start()
+    
+    @property
+    def current_state(self):
+        # Name → colour view of the state array, for consumers that want strings
+        return {signal: OCIT.byteToName[self.state[slot]] for slot, signal in enumerate(self.signals)}
     
     def _parse_stage_sequence(self, program_name):
-        import re
-        match = re.search(r'\((\d+(?:-\d+)*)\)', program_name)
-        if match:
-            return [int(x) - 1 for x in match.group(1).split('-')]
-        return list(range(len(self.all_stages)))
+        return parse_stage_sequence(program_name, len(self.all_stages))
     
     def translate(self, color):
         colors = {
@@ -145,6 +170,9 @@ class Controller:
         return colors.get(color.lower(), color.upper())
     
     def display(self, step):
+        if self.mode == 'plan':
+            self._display_plan(step)
+            return
         current_stage_idx = self.active_stages[self.current_stage_index]
         stage = self.all_stages[current_stage_idx]
         stage_num = current_stage_idx + 1
@@ -157,198 +185,373 @@ class Controller:
         print(f"\n[Step {step:03d}] STP: {self.current_program} | Stage {stage_num}: {stage['name']} ({stage_pos}) | Time: {self.time_in_stage}/{self.stage_duration}s{transition_info}")
         
         signal_display = []
-        for signal in sorted(self.signals):
-            color = self.current_state.get(signal, 'UNKNOWN')
-            eng = self.translate(color)
-            icon = {'GREEN': '\U0001F7E2', 'RED': '\U0001F534', 'YELLOW': '\U0001F7E1', 'DARK': '\U000026AB', 'ROTGELB': '\U0001F7E0'}.get(eng, '\U000026AA')
-            signal_display.append(f"{signal}:{icon}")
+        for slot in self.display_order:
+            icon = ICONS.get(self.state[slot], '\U000026AA')
+            signal_display.append(f"{self.signals[slot]}:{icon}")
         
         print("Signals: " + " | ".join(signal_display))
         
         if self.pending_program_switch:
             print(f"\U000026A0  STP SWITCH PENDING: Will change to '{self.pending_program_switch}' at end of stage")
     
+    def _display_plan(self, step):
+        transition_info = ""
+        if self.in_transition:
+            transition_info = f" [TRANSITION: {(self.transition_phase or '').upper()} {self.transition_time_remaining}s]"
+        
+        print(f"\n[Step {step:03d}] STP: {self.current_program} | Cycle: {self.cycle_second}/{self.plan['cycle_time']}s{transition_info}")
+        signal_display = []
+        for slot in self.display_order:
+            icon = ICONS.get(self.state[slot], '\U000026AA')
+            signal_display.append(f"{self.signals[slot]}:{icon}")
+        
+        print("Signals: " + " | ".join(signal_display))
+        
+        if self.pending_program_switch:
+            print(f"\U000026A0  STP SWITCH PENDING: Will change to '{self.pending_program_switch}' at end of cycle")
+    
+    def _log(self, *args):
+        if self.verbose:
+            print(*args)
+    
+    def _set_signal(self, slot, code):
+        if self.monitor is not None:
+            conflicts = self.monitor.check(slot, code)
+            if conflicts:
+                self._conflict(slot, code, conflicts)
+                return
+        self.state[slot] = code
+        if self.timeline is not None:
+            self.timeline.append(self.step, slot, code)
+        if self.event_log is not None:
+            self.event_log.record(SIGNAL, self.step, signal=self.signals[slot], color=OCIT.byteToName[code])
+        self.state_changed = True
+    
+    def _conflict(self, slot, code, conflicts):
+        # The conflicting picture is never shown: raise, or switch every
+        # signal to flashing amber and stop the signal program
+        message = f"{self.signals[slot]} → {OCIT.byteToName[code]} conflicts with {', '.join(self.monitor.names(conflicts))}"
+        if self.event_log is not None:
+            self.event_log.record(CONFLICT, self.step, signal=self.signals[slot], color=OCIT.byteToName[code],
+                                  conflicts=self.monitor.names(conflicts))
+        if self.on_conflict == 'raise':
+            raise ConflictError(message)
+        
+        print(f"\n\U0001F6A8 CONFLICT at step {self.step}: {message} - FALLBACK TO FLASHING AMBER")
+        self.fault = message
+        self.monitor = None
+        self.in_transition = False
+        self.transition = None
+        self.transition_phase = None
+        self.pending_program_switch = None
+        self.pending_command = None
+        for other in range(len(self.state)):
+            if self.state[other] != FLASHING_AMBER:
+                self._set_signal(other, FLASHING_AMBER)
+    
     def request_program_switch(self, program_name):
         if program_name not in self.programs:
-            print(f"\n\U0000274C Error: Program '{program_name}' not found!")
+            self._log(f"\n\U0000274C Error: Program '{program_name}' not found!")
             return False
         
         if program_name == self.current_program:
-            print(f"\n\U000026A0  Already on program: {program_name}")
+            self._log(f"\n\U000026A0  Already on program: {program_name}")
             return False
         
-        if self.time_in_stage < self.switch_window_start:
+        if self.mode == 'plan':
+            # Plans change at the end of the running cycle
+            self.pending_program_switch = program_name
+            self._log(f"\n\U00002713 STP SWITCH WILL OCCUR: {self.current_program} → {program_name}")
+            self._log(f"   Will switch at end of cycle (in {self.plan['cycle_time'] - self.cycle_second}s)")
+        elif self.time_in_stage < self.switch_window_start:
             time_until_window = self.switch_window_start - self.time_in_stage
-            print(f"\n\U000023F3 Switch request queued for: {self.current_program} → {program_name}")
-            print(f"   Safe switching window opens in {time_until_window}s")
+            self._log(f"\n\U000023F3 Switch request queued for: {self.current_program} → {program_name}")
+            self._log(f"   Safe switching window opens in {time_until_window}s")
             self.pending_program_switch = program_name
             self.switch_requested_at_step = self.time_in_stage
         else:
             self.pending_program_switch = program_name
             time_until_switch = self.stage_duration - self.time_in_stage
-            print(f"\n\U00002713 STP SWITCH WILL OCCUR: {self.current_program} → {program_name}")
-            print(f"   Will switch at end of stage (in {time_until_switch}s)")
+            self._log(f"\n\U00002713 STP SWITCH WILL OCCUR: {self.current_program} → {program_name}")
+            self._log(f"   Will switch at end of stage (in {time_until_switch}s)")
         
+        self.switch_requested_step = self.step + 1  # Requests take effect from the next step
+        if self.event_log is not None:
+            self.event_log.record(SWITCH_REQUEST, self.step, current=self.current_program, program=program_name)
         return True
     
     def advance(self, step):
+        if self.commands:
+            self._apply_commands()
+        if self.tick_stats is None:
+            self._advance(step)
+        else:
+            # Ticks that start a transition are timed separately from plain ticks
+            was_in_transition = self.in_transition
+            started = time.perf_counter()
+            self._advance(step)
+            self.tick_stats.record_work(time.perf_counter() - started,
+                                        transition=self.in_transition and not was_in_transition)
+        if self.state_changed:
+            self.publish_state()
+    
+    def _apply_commands(self):
+        for command in self.commands.drain():
+            if command['kind'] != SWITCH:
+                self.commands.rejected += 1
+                continue
+            pending = self.pending_command
+            if pending is not None and pending['priority'] and not command['priority']:
+                command['accepted'] = False  # A pending priority switch is not overridden
+            else:
+                command['accepted'] = self.request_program_switch(command['argument'])
+            if not command['accepted']:
+                self.commands.rejected += 1
+                continue
+            if pending is not None:
+                self.commands.superseded += 1
+            self.pending_command = command
+    
+    def publish_state(self):
+        self.state_changed = False
+        stage = self.active_stages[self.current_stage_index] if self.active_stages and self.mode == 'stages' else None
+        return self.bus.publish(self.state, self.step, self.current_program, stage)
+    
+    def _advance(self, step):
+        self.step = step
+        if self.fault:
+            return  # Flashing amber until restarted
+        if self.actuation is not None:
+            self.actuation.update(self.state, step)
         if self.in_transition:
-            self.transition_time_remaining -= 1
-            if self.transition_time_remaining <= 0:
-                self._complete_transition_phase()
+            self.transition_elapsed += 1
+            self._replay_transition()
+            return
+        
+        if self.mode == 'plan':
+            self._advance_plan()
             return
         
         self.time_in_stage += 1
         
         if self.time_in_stage == self.switch_window_start and self.pending_program_switch:
-            print(f"\n\U0001F7E2 SAFE SWITCHING WINDOW OPEN: {self.stage_duration - self.time_in_stage}s remaining")
+            self._log(f"\n\U0001F7E2 SAFE SWITCHING WINDOW OPEN: {self.stage_duration - self.time_in_stage}s remaining")
         
-        if self.time_in_stage >= self.stage_duration:
+        actuated = self._is_actuated()
+        if self.time_in_stage >= self.stage_duration or (actuated and self._gapped_out()):
+            # The stage shown on the street, even if the program changes below
+            old_idx = self.active_stages[self.current_stage_index]
             if self.pending_program_switch:
                 self.switch_program()
+            elif actuated:
+                next_stage_index = self._next_stage_with_demand()
+                if next_stage_index is not None:
+                    self._start_stage_transition(old_idx, next_stage_index)
+                # No demand anywhere else: rest in the current stage
+                return
             
-            self._start_stage_transition()
+            self._start_stage_transition(old_idx)
+    
+    def _is_actuated(self):
+        if self.actuation is None:
+            return False
+        if self.actuated is not None:
+            return self.actuated
+        return self.data['program_info'][self.current_program]['actuated']
+    
+    def _gapped_out(self):
+        # Green extension ends once all detector-equipped greens are past min green and gapped out
+        stage_idx = self.active_stages[self.current_stage_index]
+        return self.actuation.gapped_out(self.stage_greens[stage_idx], self.time_in_stage)
+    
+    def _next_stage_with_demand(self):
+        # Next stage of the sequence whose new greens have a demand; stages
+        # without demand are skipped
+        current = self.active_stages[self.current_stage_index]
+        for k in range(1, len(self.active_stages)):
+            index = (self.current_stage_index + k) % len(self.active_stages)
+            stage_idx = self.active_stages[index]
+            new_greens = [slot for slot in self.stage_greens[stage_idx] if self.state[slot] != GREEN]
+            if stage_idx != current and self.actuation.has_demand(new_greens):
+                return index
+        return None
+    
+    def _advance_plan(self):
+        # One second of the running plan: only the switch points due at this
+        # cycle second are applied
+        second = (self.cycle_second + 1) % self.plan['cycle_time']
+        self.cycle_second = second
+        if second == 0 and self.pending_program_switch:
+            # The old plan ends with its last cycle second: its cycle start
+            # is not shown, the transition leads into the new plan's
+            old_plan = self.plan
+            self.switch_program()
+            self._start_plan_transition(old_plan)
+            return
+        
+        for slot, code in self.plan['events'][second]:
+            self._set_signal(slot, code)
+            if self.fault:
+                return  # The rest of the plan is not applied in flashing amber
+    
+    def _start_plan_transition(self, old_plan):
+        # Hand over from the end of the old plan's cycle to the new plan's
+        # cycle start through the usual termination / clearance / initiation
+        # sequence
+        target = self.plan['initial']
+        if bytes(self.state) == target:
+            self._start_plan()
+            return
+        
+        key = (bytes(self.state), old_plan['name'], self.current_program)
+        self.transition = self.transitions.get(key)
+        if self.transition is None:
+            names = OCIT.byteToName
+            new_signals = {signal: names[target[slot]] for slot, signal in enumerate(self.signals)}
+            green_time = {signal: old_plan['handover_green'][slot] for slot, signal in enumerate(self.signals)}
+            self.transition = compile_state_transition(self.data, self.current_state, new_signals, f"→ {self.current_program}",
+                                                       green_time=green_time)
+            self.transitions[key] = self.transition
+        self.transition_elapsed = 0
+        self.transition_event_pos = 0
+        
+        self._log(f"\n{'~'*60}")
+        self._log(f"\U000026A1 STARTING TRANSITION: {self.transition['name']}")
+        self._log(f"{'~'*60}")
+        
+        self.in_transition = True
+        self.transition_phase = None
+        self._replay_transition()
+    
+    def _start_plan(self):
+        # New plan starts at cycle second 0
+        self.transition = None
+        self.cycle_second = 0
+        for slot, code in enumerate(self.plan['initial']):
+            if self.state[slot] != code:
+                self._set_signal(slot, code)
+                if self.fault:
+                    return
+        self._log(f"\U0001F7E2 PLAN STARTED: {self.current_program} (TU {self.plan['cycle_time']}s)")
     
     def switch_program(self):
         old_program = self.current_program
         self.current_program = self.pending_program_switch
         self.pending_program_switch = None
+        if self.pending_command is not None:
+            self.commands.executed(self.pending_command)
+            self.pending_command = None
         
         self.active_stages = self.stage_sequences[self.current_program]
         self.current_stage_index = 0  # Start at first stage of new STP
-        
-        print(f"\n{'='*60}")
-        print(f"\U0001F504 STP SWITCHED: {old_program} → {self.current_program}")
-        print(f"   New stage sequence: {[i+1 for i in self.active_stages]}")
-        print(f"{'='*60}")
+        if self.mode == 'plan':
+            self.plan = self.plans[self.current_program]
+        self.switch_history.append((self.switch_requested_step, self.step, old_program, self.current_program))
+        if self.event_log is not None:
+            self.event_log.record(SWITCH_EXECUTED, self.step, previous=old_program, program=self.current_program,
+                                  requested_step=self.switch_requested_step)
+        self.switch_requested_step = None
+        
+        self._log(f"\n{'='*60}")
+        self._log(f"\U0001F504 STP SWITCHED: {old_program} → {self.current_program}")
+        self._log(f"   New stage sequence: {[i+1 for i in self.active_stages]}")
+        self._log(f"{'='*60}")
     
     def change_stage(self):
-        old_idx = self.active_stages[self.current_stage_index]
-        self.current_stage_index = (self.current_stage_index + 1) % len(self.active_stages)
+        self.current_stage_index = self.next_stage_index
         new_idx = self.active_stages[self.current_stage_index]
         
-        old = self.all_stages[old_idx]
+        old = self.all_stages[self.transition['from']]
         new = self.all_stages[new_idx]
         
-        print(f"\n{'*'*60}")
-        print(f"STAGE CHANGE COMPLETE: {old['name']} → {new['name']}")
+        self._log(f"\n{'*'*60}")
+        self._log(f"STAGE CHANGE COMPLETE: {old['name']} → {new['name']}")
         
-        for signal in self.signals:
-            old_color = old['signals'].get(signal)
-            new_color = new['signals'].get(signal)
-            
-            if old_color != new_color:
-                print(f"   {signal}: {self.translate(old_color)} → {self.translate(new_color)}")
-        
-        print(f"{'*'*60}")
+        for slot in self.transition['changing']:
+            signal = self.signals[slot]
+            self._log(f"   {signal}: {self.translate(old['signals'].get(signal))} → {self.translate(new['signals'].get(signal))}")
         
-        self.current_state = new['signals'].copy()
+        self._log(f"{'*'*60}")
         
-        for signal in self.signals:
-            if signal in self.signal_queues:
-                try:
-                    self.signal_queues[signal]['wish'].put(self.current_state.get(signal, 'dunkel'))
-                except:
-                    pass
+        # The schedule has already set every changing signal; this only
+        # catches signals missing from the compiled transition
+        state = self.state
+        for slot, code in enumerate(self.stage_states[new_idx]):
+            if state[slot] != code:
+                self._set_signal(slot, code)
+                if self.fault:
+                    return
         
+        self.transition = None
         self.time_in_stage = 0
         self.switch_requested_at_step = None
+        if self.event_log is not None:
+            self.event_log.record(STAGE_START, self.step, stage=new_idx + 1, name=new['name'], program=self.current_program)
+    
+    def _get_transition(self, old_idx, new_idx):
+        transition = self.transitions.get((old_idx, new_idx))
+        if transition is None:
+            # Not listed in the LISA transition matrix; compile once and keep it
+            transition = compile_transition(self.data, old_idx, new_idx, allowed=False)
+            self.transitions[(old_idx, new_idx)] = transition
+        return transition
     
-    def _start_stage_transition(self):
-        old_idx = self.active_stages[self.current_stage_index]
-        next_stage_index = (self.current_stage_index + 1) % len(self.active_stages)
+    def _start_stage_transition(self, old_idx, next_stage_index=None):
+        if next_stage_index is None:
+            next_stage_index = (self.current_stage_index + 1) % len(self.active_stages)
+        self.next_stage_index = next_stage_index
         self.next_stage_idx = self.active_stages[next_stage_index]
         
-        old_stage = self.all_stages[old_idx]
-        new_stage = self.all_stages[self.next_stage_idx]
+        self.transition = self._get_transition(old_idx, self.next_stage_idx)
+        self.transition_elapsed = 0
+        self.transition_event_pos = 0
         
-        print(f"\n{'~'*60}")
-        print(f"\U000026A1 STARTING TRANSITION: {old_stage['name']} → {new_stage['name']}")
-        print(f"{'~'*60}")
+        self._log(f"\n{'~'*60}")
+        self._log(f"\U000026A1 STARTING TRANSITION: {self.transition['name']}")
+        if not self.transition['allowed']:
+            self._log(f"\U000026A0  Transition not in LISA transition matrix")
+        self._log(f"{'~'*60}")
         
         self.in_transition = True
-        self.transition_phase = 'yellow'
-        self._apply_yellow_phase(old_stage, new_stage)
-        
-    def _apply_yellow_phase(self, old_stage, new_stage):
-        self.transition_time_remaining = self.yellow_duration
-        
-        print(f"\U0001F7E1 Phase 1: YELLOW (Termination) - {self.yellow_duration}s")
-        for signal in self.signals:
-            old_color = old_stage['signals'].get(signal)
-            new_color = new_stage['signals'].get(signal)
-            
-            if old_color == 'gruen' and new_color == 'rot':
-                self.current_state[signal] = 'gelb'
-                print(f"   {signal}: GREEN → YELLOW")
-                # Update visualization
-                if signal in self.signal_queues:
-                    try:
-                        self.signal_queues[signal]['wish'].put('gelb')
-                    except:
-                        pass
-    
-    def _complete_transition_phase(self):
-        old_idx = self.active_stages[self.current_stage_index]
-        old_stage = self.all_stages[old_idx]
-        new_stage = self.all_stages[self.next_stage_idx]
-        
-        if self.transition_phase == 'yellow':
-            self._apply_all_red_phase(old_stage, new_stage)
-            
-        elif self.transition_phase == 'all_red':
-            self._apply_red_yellow_phase(old_stage, new_stage)
-            
-        elif self.transition_phase == 'red_yellow':
+        self.transition_phase = None
+        self._replay_transition()
+    
+    def _replay_transition(self):
+        # Track the current phase and apply the precompiled events that are due
+        transition = self.transition
+        done = True
+        for phase, phase_start, phase_end in transition['phases']:
+            if self.transition_elapsed < phase_end:
+                if phase != self.transition_phase:
+                    self.transition_phase = phase
+                    self._log(f"{PHASE_TITLES[phase]} - {phase_end - phase_start}s")
+                    if self.event_log is not None:
+                        self.event_log.record(TRANSITION_PHASE, self.step, transition=transition['name'],
+                                              phase=phase, duration=phase_end - phase_start)
+                self.transition_time_remaining = phase_end - self.transition_elapsed
+                done = False
+                break
+        
+        schedule = transition['schedule']
+        pos = self.transition_event_pos
+        while pos < len(schedule) and schedule[pos][0] <= self.transition_elapsed:
+            _, slot, code = schedule[pos]
+            if self.verbose:
+                self._log(f"   {self.signals[slot]}: {self.translate(OCIT.byteToName[self.state[slot]])} → {self.translate(OCIT.byteToName[code])}")
+            self._set_signal(slot, code)
+            if self.fault:
+                return  # _conflict has ended the transition; nothing after it is applied
+            pos += 1
+        self.transition_event_pos = pos
+        
+        if done:
             self.in_transition = False
             self.transition_phase = None
-            self.change_stage()
-    
-    def _apply_all_red_phase(self, old_stage, new_stage):
-        print(f"\U0001F534 Phase 2: ALL-RED (Clearance)")
-        
-        for signal in self.signals:
-            old_color = old_stage['signals'].get(signal)
-            if old_color == 'gruen':
-                self.current_state[signal] = 'rot'
-                print(f"   {signal}: YELLOW → RED")
-                if signal in self.signal_queues:
-                    try:
-                        self.signal_queues[signal]['wish'].put('rot')
-                    except:
-                        pass
-        
-        max_clearance = 0
-        for from_signal in self.signals:
-            if old_stage['signals'].get(from_signal) == 'gruen':
-                for to_signal in self.signals:
-                    if new_stage['signals'].get(to_signal) == 'gruen':
-                        if from_signal in self.intergreens:
-                            if to_signal in self.intergreens[from_signal]:
-                                clearance = self.intergreens[from_signal][to_signal]
-                                max_clearance = max(max_clearance, clearance)
-
-        self.transition_time_remaining = max(max_clearance, 2)
-        self.transition_phase = 'all_red'
-        print(f"   Clearance time: {self.transition_time_remaining}s (from intergreen matrix)")
-    
-    def _apply_red_yellow_phase(self, old_stage, new_stage):
-        self.transition_time_remaining = self.red_yellow_duration
-        self.transition_phase = 'red_yellow'
-        
-        print(f"\U0001F7E0 Phase 3: RED-YELLOW (Initiation) - {self.red_yellow_duration}s")
-        for signal in self.signals:
-            old_color = old_stage['signals'].get(signal)
-            new_color = new_stage['signals'].get(signal)
-            
-            if old_color == 'rot' and new_color == 'gruen':
-                self.current_state[signal] = 'rotgelb'
-                print(f"   {signal}: RED → RED-YELLOW")
-                if signal in self.signal_queues:
-                    try:
-                        self.signal_queues[signal]['wish'].put('rotgelb')
-                    except:
-                        pass
+            self.transition_time_remaining = 0
+            if self.mode == 'plan':
+                self._start_plan()
+            else:
+                self.change_stage()
     
     def show_available_programs(self):
         print(f"\n{'='*60}")
@@ -359,204 +562,210 @@ class Controller:
             print(f"  {idx}. {name} {marker}")
         print(f"{'='*60}")
     
-    def run(self, seconds):
+    def run(self, seconds, tick=1.0, scheduler=None, checkpoint_path=None, checkpoint_every=60):
         print(f"\n{'#'*60}")
         print(f"TRAFFIC SIGNAL SIMULATION")
         print(f"{'#'*60}")
         print(f"Duration: {seconds} steps = {seconds} seconds")
-        print(f"Stage duration: {self.stage_duration} seconds per stage")
         print(f"Starting STP: {self.current_program}")
-        print(f"Stage sequence: {[i+1 for i in self.active_stages]}")
+        if self.mode == 'plan':
+            print(f"Plan execution: LISA switching times, cycle time {self.plan['cycle_time']}s")
+        else:
+            print(f"Stage duration: {self.stage_duration} seconds per stage")
+            print(f"Stage sequence: {[i+1 for i in self.active_stages]}")
         print(f"{'#'*60}")
         
         self.show_available_programs()
         
-        for step in range(1, seconds + 1):
-            if use_keyboard and msvcrt.kbhit():
-                key = msvcrt.getwch()
-                if key in ['1', '2', '3']:
-                    idx = int(key) - 1
-                    if 0 <= idx < len(self.program_names):
-                        self.request_program_switch(self.program_names[idx])
-            
-            self.display(step)
-            self.advance(step)
-            time.sleep(1)
-        
-        print(f"\n{'#'*60}")
-        print(f"\U00002713 SIMULATION COMPLETE - {seconds} steps finished")
-        print(f"{'#'*60}")
-
-
-class OCIT_def:
-    def __init__(self, file_path):
-        self.indexToName = {}
-        self.nameToCode = {}
-        self.codeToName = {}
-        self.NameToASCII = {}
-        self.ASCIIToName = {}
-        self.codeToASCII = {}
-        self.ASCIIToCode = {}
-        self.dict_list = [
-            self.indexToName,
-            self.nameToCode,
-            self.codeToName,
-            self.NameToASCII,
-            self.ASCIIToName,
-            self.codeToASCII,
-            self.ASCIIToCode,
-        ]
-
-        with open(file_path, mode='r', newline='', encoding='utf-8') as csv_OCIT_def:
-            reader = csv.reader(csv_OCIT_def, delimiter=';')
-            for row in reader:
-                self.indexToName[row[0]] = row[1]
-                self.nameToCode[row[1]] = row[2]
-                self.codeToName[row[2]] = row[1]
-                self.NameToASCII[row[1]] = row[3]
-                self.ASCIIToName[row[3]] = row[1]
-                self.codeToASCII[row[2]] = row[3]
-                self.ASCIIToCode[row[3]] = row[2]
-
-
-class TrafficLightApp:
-    def __init__(self, window, name, switch_interval_queue, signal_wish_queue):
-        scal = 0.75
-        self.window = window
-        self.window.title(name)
-
-        self.width = scal * (65 + 200 + 65)
-        self.height = scal * (65 + (200 + 35) * 2 + 200 + 65)
-        self.canvas = tk.Canvas(window, width=self.width, height=self.height, bg='black')
-        self.canvas.pack()
-
-        self.colors = {
-            "rot": '#B81B0E',
-            "gelb": '#F5A900',
-            "gruen": '#339966',
-            "weiß": '#FFFFFF',
-            "aus": '#4D4D4D',
-        }
-
-        self.signal_wish_queue = signal_wish_queue
-        self.signal_patterns = {
-            "rot": [1, 0, 0, 0, 0],
-            "rotgelb": [1, 1, 0, 0, 0],
-            "gelb": [0, 1, 0, 0, 0],
-            "gruen": [0, 0, 1, 0, 0],
-            "dunkel": [0, 0, 0, 0, 0],
-            "rotgruen": [1, 0, 1, 0, 0],
-            "gelbgruen": [0, 1, 1, 0, 0],
-            "rotblk": [1, 0, 0, 1, 0],
-            "gelbblk": [0, 1, 0, 1, 0],
-            "gruenblk": [0, 0, 1, 1, 0],
-            "wbl_rotgruen": [1, 0, 1, 1, 1],
-            "wbl_rotgelb": [1, 1, 0, 1, 1],
-            "wbl_gelbgruen": [0, 1, 1, 1, 1],
-            "rotblk2hz": [1, 0, 0, 2, 0],
-            "gelbblk2hz": [0, 1, 0, 2, 0],
-            "gruenblk2hz": [0, 0, 1, 2, 0],
-            "wbl2hz_rotgruen": [1, 0, 1, 2, 1],
-            "wbl2hz_rotgelb": [1, 1, 0, 2, 1],
-            "wbl2hz_gelbgruen": [0, 1, 1, 2, 1],
-        }
-
-        self.switch_interval_queue = switch_interval_queue
-        self.current_interval = 10
-
-        self.lights = {
-            "rot": self.canvas.create_oval(scal * 65, scal * 65, scal * 265, scal * 265, fill=self.colors["aus"]),
-            "gelb": self.canvas.create_oval(scal * 65, scal * 300, scal * 265, scal * 500, fill=self.colors["aus"]),
-            "gruen": self.canvas.create_oval(scal * 65, scal * 535, scal * 265, scal * 735, fill=self.colors["aus"])
-        }
-        self.lights_no = {
-            1: "rot",
-            2: "gelb",
-            3: "gruen",
-        }
-        self.signal_wish = 'gelbblk'
-        self.signal_wish_controll = 'dunkel'
-
-        self.freq_val = False
-        self.wbl_val = "dunkel"
-
-        self.update_light()
-        print(f"Initializing signal vis for {name}- Done")
-
-    def update_light(self):
+        # Step k runs at start + (k - first) * tick on the monotonic clock, so
+        # the time spent per step does not add up as drift. A restored
+        # controller continues from its checkpointed step.
+        self.tick_stats = TickStats(tick)
+        start_keyboard(self.commands, self.program_names)
+        first = self.step + 1
+        start = time.monotonic()
         try:
-            self.current_interval = self.switch_interval_queue.get()
-        except:
-            pass
-
+            for step in range(first, first + seconds):
+                deadline = start + (step - first) * tick
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                woke = time.monotonic()
+                
+                if scheduler is not None:
+                    scheduler.advance(step)  # Day / week plan switching points
+                
+                if self.verbose:
+                    self.display(step)
+                self.advance(step)
+                if checkpoint_path and step % checkpoint_every == 0:
+                    write_checkpoint(self, checkpoint_path)
+                self.tick_stats.record_tick(deadline, woke, time.monotonic())
+        finally:
+            print(f"\n{'#'*60}")
+            print(f"\U00002713 SIMULATION COMPLETE - {self.tick_stats.ticks} steps finished")
+            print(self.tick_stats.report())
+            print(self.commands.report())
+            print(f"{'#'*60}")
+    
+    def simulate(self, seconds, timeline_path=None, switches=None, on_step=None):
+        # Headless run on a virtual clock: no sleep, no console output.
+        # Returns the signal Timeline, starting with the state of every signal
+        # at the current step. switches: (step, program) requests, each issued
+        # just before that step is advanced. on_step(step), if given, is called
+        # just before each step too (e.g. to feed simulated detector pulses).
+        switches = sorted(switches or [], key=lambda switch: switch[0])
+        next_switch = 0
+        verbose = self.verbose
+        self.verbose = False
+        self.timeline = Timeline(self.signals)
+        for slot, code in enumerate(self.state):
+            self.timeline.append(self.step, slot, code)
         try:
-            self.signal_wish = self.signal_wish_queue.get()
-        except queue.Empty:
-            self.signal_wish = 'dunkel'
-        if not self.signal_wish_controll == self.signal_wish:
-            print(f'Signalbild: {self.signal_wish}')
-            self.signal_wish_controll = self.signal_wish
+            for step in range(self.step + 1, self.step + seconds + 1):
+                while next_switch < len(switches) and switches[next_switch][0] <= step:
+                    self.request_program_switch(switches[next_switch][1])
+                    next_switch += 1
+                if on_step is not None:
+                    on_step(step)
+                self.advance(step)
+            timeline = self.timeline
+        except ConflictError as error:
+            error.timeline = self.timeline  # Signal history up to the conflict
+            raise
+        finally:
+            self.timeline = None
+            self.verbose = verbose
+        
+        if timeline_path:
+            write_timeline(timeline, timeline_path)
+        return timeline
 
-        for light in self.lights.values():
-            self.canvas.itemconfig(light, fill=self.colors["aus"])
 
-        var = self.signal_patterns[self.signal_wish]
-        rot = bool(var[0])
-        gelb = bool(var[1])
-        gruen = bool(var[2])
-        freq = int(var[3])
-        wbl = bool(var [4])
+class Timeline:
+    # Signal changes as three parallel typed arrays (step, slot, OCIT code),
+    # so long recordings stay compact; iterates as (step, signal, color)
+    def __init__(self, signals):
+        self.signals = signals
+        self.steps = array('I')
+        self.slots = array('H')
+        self.codes = array('B')
+    
+    def append(self, step, slot, code):
+        self.steps.append(step)
+        self.slots.append(slot)
+        self.codes.append(code)
+    
+    def __len__(self):
+        return len(self.steps)
+    
+    def __iter__(self):
+        names = OCIT.byteToName
+        for step, slot, code in zip(self.steps, self.slots, self.codes):
+            yield (step, self.signals[slot], names[code])
 
-        if freq > 0:
-            self.current_interval = int(1000/(freq*2))
-            for light_no in self.lights_no.keys():
-                if bool(var[light_no - 1]):
-                    if not self.wbl_val == self.lights[self.lights_no[light_no]]:
-                        self.canvas.itemconfig(self.lights[self.lights_no[light_no]],
-                                               fill=self.colors[self.lights_no[light_no]])
-                        self.wbl_val = self.lights[self.lights_no[light_no]]
-                        break
-                    elif not wbl:
-                        self.wbl_val = "dunkel"
-                        break
 
-        else:
-            if rot:
-                self.canvas.itemconfig(self.lights['rot'], fill=self.colors['rot'])
-            if gelb:
-                self.canvas.itemconfig(self.lights['gelb'], fill=self.colors['gelb'])
-            if gruen:
-                self.canvas.itemconfig(self.lights['gruen'], fill=self.colors['gruen'])
+def write_timeline(timeline, file_path):
+    with open(file_path, mode='w', newline='', encoding='utf-8') as csv_timeline:
+        writer = csv.writer(csv_timeline, delimiter=';')
+        writer.writerow(['step', 'signal', 'color'])
+        writer.writerows(timeline)
 
-        self.window.after(self.current_interval, self.update_light)
+
+def read_timeline(file_path):
+    # Inverse of write_timeline; signal slots follow the order of first appearance,
+    # which for recorded timelines is the controller's slot order
+    signals = []
+    index = {}
+    rows = []
+    with open(file_path, newline='', encoding='utf-8') as csv_timeline:
+        reader = csv.reader(csv_timeline, delimiter=';')
+        next(reader, None)
+        for step, signal, color in reader:
+            if signal not in index:
+                index[signal] = len(signals)
+                signals.append(signal)
+            rows.append((int(step), index[signal], OCIT.nameToByte[color]))
+    
+    timeline = Timeline(signals)
+    for step, slot, code in rows:
+        timeline.append(step, slot, code)
+    return timeline
 
 
-def run_traffic_light_app(name, switch_interval_queue, signal_wish_queue):
-    window = tk.Tk()
-    app = TrafficLightApp(window, name=name, switch_interval_queue=switch_interval_queue, signal_wish_queue=signal_wish_queue)
-    window.mainloop()
+def program_log_path(log_path, program):
+    # events.jsonl -> events_<STP>.jsonl; only the file name's extension is split
+    root, extension = os.path.splitext(log_path)
+    return f"{root}_{program}{extension}"
 
 
-def init_signal_vis(name):
-    color_switch_interval_queue = queue.Queue(maxsize=1)
-    signal_wish_queue = queue.Queue(maxsize=1)
-    color_switch_interval_queue.put(10)
-    signal_wish_queue.put("dunkel")
+def run_headless(data, seconds=7 * 24 * 3600, programs=None, mode='stages', rate=None, log_path=None, out_dir='.'):
+    # Faster-than-real-time run of each STP, timelines to timeline_<STP>.csv
+    rates = {detector['name']: rate for detector in data['detectors']}
+    for program in programs or data['programs']:
+        event_log = EventLog(program_log_path(log_path, program)) if log_path else None
+        detector_input = DetectorInput(data['detectors']) if rate else None
+        controller = Controller(data, gui=False, start_program=program, event_log=event_log, mode=mode,
+                                detector_input=detector_input, actuated=True if rate else None)
+        source = SimulatedDetectorSource(detector_input, rates, seed=311) if rate else None
+        start = time.perf_counter()
+        timeline = controller.simulate(seconds, timeline_path=os.path.join(out_dir, f"timeline_{program}.csv"),
+                                       on_step=source.push_step if source else None)
+        if event_log:
+            event_log.close()
+        print(f"\U00002713 {program}: {seconds} steps, {len(timeline)} signal changes in {time.perf_counter() - start:.2f}s")
 
-    thread = threading.Thread(target=run_traffic_light_app, args=(name, color_switch_interval_queue,signal_wish_queue))
-    thread.daemon = True
-    thread.start()
-    print(f"Initializing signal vis for {name}")
 
-    return color_switch_interval_queue, signal_wish_queue
+def run_live(data, seconds=180, mode='stages', rate=None, log_path=None, checkpoint_path=None, gui=True, verbose=True,
+             tick=1.0):
+    print("\nStarting traffic controller...")
+    event_log = EventLog(log_path) if log_path else None
+    detector_input = DetectorInput(data['detectors']) if rate else None
+    # Day / week plan (Schaltuhr): start in the program due now, switch at its switching points
+    schedule = compile_week_schedule(data)
+    scheduler = SwitchScheduler()
+    controller = Controller(data, gui=gui, event_log=event_log, mode=mode, detector_input=detector_input,
+                            actuated=True if rate else None, start_program=program_at(schedule, scheduler.start_second))
+    controller.verbose = verbose  # False: events only, no per-step console status
+    if rate:
+        SimulatedDetectorSource(detector_input, {detector['name']: rate for detector in data['detectors']}).start()
+    # Resume from the last checkpoint (re-aligned to the wall clock), checkpoint every minute
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        started = time.perf_counter()
+        caught_up = restore(controller, read_checkpoint(checkpoint_path), realign=True)
+        print(f"\U0001F504 Resumed at step {controller.step} ({caught_up} steps caught up) in {(time.perf_counter() - started) * 1e3:.1f}ms")
+        scheduler.align(controller.step)
+    if scheduler.add(controller.name, schedule, lambda program: controller.commands.push(SWITCH, program, source='scheduler'),
+                     step=controller.step):
+        print(f"\U0001F4C5 Week plan: {len(schedule)} switching points")
+    try:
+        controller.run(seconds, tick=tick, scheduler=scheduler, checkpoint_path=checkpoint_path)
+    finally:
+        if event_log:
+            event_log.close()
+    return controller
 
 
 if __name__ == '__main__':
+    # Legacy flags; cli.py offers the same as run / simulate subcommands
     print("Loading XML file...")
-    data = parse_xml('z1_fg311.xml')
+    data = load_model('z1_fg311.xml')
     print(f"\U00002713 Found {len(data['stages'])} total stages")
     print(f"\U00002713 Found {len(data['programs'])} signal time plans (STPs)")
     
-    print("\nStarting traffic controller...")
-    controller = Controller(data)
-    controller.run(180)
+    # --log PATH: structured JSON Lines event log (one file per STP when headless)
+    log_path = sys.argv[sys.argv.index('--log') + 1] if '--log' in sys.argv else None
+    # --plan: execute the LISA switching times of each STP instead of fixed stages
+    mode = 'plan' if '--plan' in sys.argv else 'stages'
+    # --actuated RATE: vehicle-actuated stages fed by simulated detectors (vehicles/s per detector)
+    rate = float(sys.argv[sys.argv.index('--actuated') + 1]) if '--actuated' in sys.argv else None
+    # --checkpoint PATH: resume from and periodically write a controller checkpoint
+    checkpoint_path = sys.argv[sys.argv.index('--checkpoint') + 1] if '--checkpoint' in sys.argv else None
+    
+    if '--headless' in sys.argv:
+        # Faster-than-real-time run: one simulated week per STP, timelines to CSV
+        run_headless(data, mode=mode, rate=rate, log_path=log_path)
+        sys.exit(0)
+    
+    run_live(data, mode=mode, rate=rate, log_path=log_path, checkpoint_path=checkpoint_path,
+             verbose='--quiet' not in sys.argv)
@@ -0,0 +1,48 @@
+import hashlib
+import os
+import pickle
+
+# Cache file layout: MAGIC, 16-byte BLAKE2b digest of the XML, pickled model.
+# Bump MODEL_VERSION whenever parse_xml changes the structure it returns.
+MODEL_VERSION = 7
+MAGIC = b'VSCM' + bytes([MODEL_VERSION])
+DIGEST_SIZE = 16
+
+
+def cache_path_for(xml_path):
+    return xml_path + '.cache'
+
+
+def load_model(xml_path, cache_path=None):
+    # Parsed model for xml_path, from the cache next to it when the XML content
+    # is unchanged; otherwise parse the XML and (re)write the cache
+    cache_path = cache_path or cache_path_for(xml_path)
+    with open(xml_path, 'rb') as xml_file:
+        digest = hashlib.blake2b(xml_file.read(), digest_size=DIGEST_SIZE).digest()
+
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            if cache_file.read(len(MAGIC) + DIGEST_SIZE) == MAGIC + digest:
+                return pickle.load(cache_file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    from xml_parser import parse_xml  # Only needed on a cache miss
+    data = parse_xml(xml_path)
+    _write_cache(cache_path, digest, data)
+    return data
+
+
+def _write_cache(cache_path, digest, data):
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as cache_file:
+            cache_file.write(MAGIC + digest)
+            pickle.dump(data, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)  # Readers never see a half-written cache
+    except OSError:
+        # Read-only location: run without a cache
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
@@ -0,0 +1,124 @@
+import struct
+from collections import namedtuple
+
+from signal_util import OCIT
+
+# Binary state frame: fixed header + one OCIT code byte per signal slot.
+#   magic 'VSCF' | version | signal count | node number | program | stage | tick
+#   4s             B         B              H             B         B       I
+# program is the index into the model's program list and stage the 0-based
+# stage index, NONE (255) when not set. Little-endian; 14 + n bytes per frame
+# (21 bytes for intersection 311, against several hundred for a dict of
+# colour strings).
+MAGIC = b'VSCF'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHBBI')
+NONE = 0xFF
+
+Frame = namedtuple('Frame', ['node', 'program', 'stage', 'tick', 'state'])
+
+
+class FrameError(ValueError):
+    pass
+
+
+class FrameCodec:
+    # Encoder / decoder for one intersection layout (signal slots and program
+    # list of a parsed model)
+    def __init__(self, data):
+        self.node = data.get('node', {}).get('number') or 0
+        self.signals = list(data['signals'])
+        self.programs = list(data['programs'])
+        self.program_index = {name: i for i, name in enumerate(self.programs)}
+        self.size = HEADER.size + len(self.signals)
+
+    def encode(self, state, tick, program=None, stage=None):
+        frame = bytearray(self.size)
+        self.encode_into(frame, 0, state, tick, program, stage)
+        return bytes(frame)
+
+    def encode_into(self, buffer, offset, state, tick, program=None, stage=None):
+        # Writes one frame into a preallocated buffer (recording, send buffers)
+        HEADER.pack_into(buffer, offset, MAGIC, VERSION, len(self.signals), self.node,
+                         self.program_index.get(program, NONE), NONE if stage is None else stage, tick)
+        buffer[offset + HEADER.size:offset + self.size] = state
+        return offset + self.size
+
+    def encode_snapshot(self, snapshot):
+        return self.encode(snapshot.state, snapshot.step or 0, snapshot.program, snapshot.stage)
+
+    def decode(self, frame, offset=0):
+        # Frame with the program as a name; state stays a memoryview
+        node, program, stage, tick, state = decode_frame(frame, offset)
+        return Frame(node, self.programs[program] if program < len(self.programs) else None,
+                     None if stage == NONE else stage, tick, state)
+
+    def names(self, state):
+        # {signal: OCIT colour name}, for display and debugging only
+        return {signal: OCIT.byteToName[code] for signal, code in zip(self.signals, state)}
+
+
+def decode_frame(frame, offset=0):
+    # Zero-copy: the returned state is a memoryview into `frame`
+    view = memoryview(frame)
+    magic, version, count, node, program, stage, tick = HEADER.unpack_from(view, offset)
+    if magic != MAGIC or version != VERSION:
+        raise FrameError(f"Not a version {VERSION} state frame")
+    start = offset + HEADER.size
+    if len(view) < start + count:
+        raise FrameError(f"Truncated frame: {len(view) - start} of {count} signal bytes")
+    return Frame(node, program, stage, tick, view[start:start + count])
+
+
+def frame_size(frame, offset=0):
+    # Length of the frame at `offset`, from its header
+    return HEADER.size + frame[offset + 5]
+
+
+def iter_frames(buffer):
+    # Decodes consecutive frames of a recording or stream buffer
+    view = memoryview(buffer)
+    offset = 0
+    while offset + HEADER.size <= len(view):
+        frame = decode_frame(view, offset)
+        yield frame
+        offset += HEADER.size + len(frame.state)
+
+
+class FrameRecorder:
+    # Appends frames to a binary recording; frames are packed into one
+    # preallocated buffer and written out when it is full
+    def __init__(self, file_path, codec, buffer_frames=4096):
+        self.file = open(file_path, 'wb')
+        self.codec = codec
+        self.buffer = bytearray(codec.size * buffer_frames)
+        self.offset = 0
+        self.frames = 0
+
+    def record(self, state, tick, program=None, stage=None):
+        if self.offset + self.codec.size > len(self.buffer):
+            self.flush()
+        self.offset = self.codec.encode_into(self.buffer, self.offset, state, tick, program, stage)
+        self.frames += 1
+
+    def record_snapshot(self, snapshot):
+        self.record(snapshot.state, snapshot.step or 0, snapshot.program, snapshot.stage)
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.offset])
+        self.offset = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_frames(file_path):
+    with open(file_path, 'rb') as frame_file:
+        return list(iter_frames(frame_file.read()))
@@ -0,0 +1,234 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from conflict_monitor import ConflictError
+from main import GREEN, Controller, parse_stage_sequence, write_timeline
+from model_cache import load_model
+from scenario_sweep import cycle_length, find_intergreen_violations
+
+# Offline proof that a LISA export cannot produce an intergreen or conflict
+# violation, by running every distinct situation once:
+#   sequence     - one full cycle of a program's stage sequence (every
+#                  consecutive stage pair, including the wrap-around)
+#   switch       - a program switch requested in the safe switching window of
+#                  each stage of each program, into each other program
+#   skip         - every other stage pair of a program's sequence, reached by
+#                  an actuated controller skipping stages without demand
+#   plan         - two cycles of a program's LISA switching times
+#   plan_switch  - a plan switch at the end of each plan's cycle
+# A switch always executes at the end of the stage (or cycle), so every moment
+# inside the window leads to the same transition: units are memoised on the
+# (from stage, to stage) pair, or plan state, they exercise. Already covered
+# pairs are not run again.
+
+STAGE_DURATION = 60  # Controller default; the window is its last 10%
+
+
+def enumerate_units(data):
+    units = []
+    covered = set()  # Memo of stage pairs / plan handovers already exercised
+    programs = list(data['programs'].keys())
+    sequences = {program: parse_stage_sequence(program, len(data['stages'])) for program in programs}
+    window = 0  # Switch moments in the safe windows represented by the units
+
+    for program, sequence in sequences.items():
+        pairs = sorted({(stage, sequence[(pos + 1) % len(sequence)]) for pos, stage in enumerate(sequence)})
+        covered.update(pairs)
+        units.append({'kind': 'sequence', 'program': program, 'pairs': pairs,
+                      'duration': cycle_length(data, program) + STAGE_DURATION})
+
+    for program, sequence in sequences.items():
+        for target in programs:
+            if target == program:
+                continue
+            target_sequence = sequences[target]
+            for pos, stage in enumerate(sequence):
+                window += STAGE_DURATION - int(STAGE_DURATION * 0.90)
+                pair = (stage, target_sequence[1 % len(target_sequence)])
+                if pair in covered:
+                    continue
+                covered.add(pair)
+                units.append({'kind': 'switch', 'program': program, 'position': pos, 'target': target, 'pairs': [pair],
+                              'duration': cycle_length(data, program) + cycle_length(data, target) + STAGE_DURATION})
+
+    for program, sequence in sequences.items():
+        for pos, stage in enumerate(sequence):
+            for skip_to, next_stage in enumerate(sequence):
+                pair = (stage, next_stage)
+                if next_stage == stage or pair in covered:
+                    continue
+                covered.add(pair)
+                units.append({'kind': 'skip', 'program': program, 'position': pos, 'skip_to': skip_to, 'pairs': [pair],
+                              'duration': 2 * cycle_length(data, program) + STAGE_DURATION})
+
+    plans = data.get('signal_plans', {})
+    for program, plan in plans.items():
+        units.append({'kind': 'plan', 'program': program, 'duration': 2 * plan['cycle_time']})
+    for program, plan in plans.items():
+        for target in plans:
+            key = (plan['handover'], plan['handover_green'], target)
+            if target == program or key in covered:
+                continue
+            covered.add(key)
+            units.append({'kind': 'plan_switch', 'program': program, 'target': target,
+                          'duration': plan['cycle_time'] + STAGE_DURATION + 2 * plans[target]['cycle_time']})
+
+    return units, window
+
+
+def stage_pairs(units):
+    # Every (from stage, to stage) transition the units exercise
+    return {pair for unit in units for pair in unit.get('pairs', [])}
+
+
+class ScriptedDemand:
+    # Stands in for the detector Actuation of an actuated controller: stages
+    # keep their full duration, and the only stage with demand is the next one
+    # of the sequence, except at the end of stage position `position`, where it
+    # is the stage at `skip_to`. Demand is matched on the new greens, as the
+    # controller asks for it, so a stage is only reached if demand can select
+    # it; skipped is set once the transition into it has started.
+    def __init__(self, controller, position, skip_to):
+        self.controller = controller
+        self.position = position
+        self.skip_to = skip_to
+        self.skipped = False
+
+    def update(self, state, step):
+        controller = self.controller
+        transition = controller.transition
+        if (controller.in_transition and transition['from'] == controller.active_stages[self.position]
+                and transition['to'] == controller.active_stages[self.skip_to]):
+            self.skipped = True
+
+    def gapped_out(self, slots, time_in_stage):
+        return False
+
+    def has_demand(self, slots):
+        controller = self.controller
+        index = controller.current_stage_index
+        if index == self.position and not self.skipped:
+            target = self.skip_to
+        else:
+            target = (index + 1) % len(controller.active_stages)
+        stage_idx = controller.active_stages[target]
+        wanted = [slot for slot in controller.stage_greens[stage_idx] if controller.state[slot] != GREEN]
+        return slots == wanted
+
+
+def run_unit(data, unit):
+    mode = 'plan' if unit['kind'].startswith('plan') else 'stages'
+    switches = [(1, unit['target'])] if unit['kind'] == 'plan_switch' else None
+    conflict = None
+    timeline = None
+    demand = None
+    transitions = set()  # (from stage, to stage) of every stage transition started
+    try:
+        controller = Controller(data, gui=False, start_program=unit['program'], mode=mode, on_conflict='raise')
+        controller.verbose = False
+        if unit['kind'] == 'skip':
+            demand = controller.actuation = ScriptedDemand(controller, unit['position'], unit['skip_to'])
+            controller.actuated = True
+
+        def on_step(step):
+            if controller.in_transition and controller.mode == 'stages':
+                transitions.add((controller.transition['from'], controller.transition['to']))
+            # Request inside the safe switching window of the chosen stage
+            if (unit['kind'] == 'switch' and not controller.switch_history and not controller.pending_program_switch
+                    and not controller.in_transition and controller.current_stage_index == unit['position']
+                    and controller.time_in_stage >= controller.switch_window_start):
+                controller.request_program_switch(unit['target'])
+
+        timeline = controller.simulate(unit['duration'], switches=switches, on_step=on_step)
+    except ConflictError as error:
+        conflict = str(error)
+        timeline = getattr(error, 'timeline', None)  # Steps up to the conflict
+
+    violations = find_intergreen_violations(timeline, data['intergreen_matrix']) if timeline is not None else []
+    failed = bool(conflict or violations)
+    return {
+        'unit': unit,
+        'failed': failed,
+        'reached': demand is None or demand.skipped or failed,  # False: demand cannot select the skipped-to stage
+        'transitions': transitions,
+        'conflict': conflict,
+        'violations': violations,
+        'timeline': timeline if failed else None,  # Counterexample
+    }
+
+
+_worker_data = None
+
+
+def _init_worker(xml_path):
+    global _worker_data
+    _worker_data = load_model(xml_path)
+
+
+def _run_in_worker(unit):
+    return run_unit(_worker_data, unit)
+
+
+def verify(xml_path, processes=None):
+    data = load_model(xml_path)
+    units, window = enumerate_units(data)
+    processes = min(processes or os.cpu_count() or 1, len(units)) or 1
+    if processes == 1:
+        results = [run_unit(data, unit) for unit in units]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(xml_path,)) as pool:
+            results = list(pool.map(_run_in_worker, units))
+    return units, window, results
+
+
+def describe(unit):
+    if unit['kind'] == 'switch':
+        return f"switch {unit['program']} (stage position {unit['position'] + 1}) → {unit['target']}"
+    if unit['kind'] == 'skip':
+        stage, next_stage = unit['pairs'][0]
+        return f"skip {unit['program']} stage {stage + 1} → stage {next_stage + 1}"
+    if unit['kind'] == 'plan_switch':
+        return f"plan switch {unit['program']} → {unit['target']}"
+    return f"{unit['kind']} {unit['program']}"
+
+
+def report(units, window, results, seconds, out_dir='.'):
+    # Prints the verification result, writes counterexample timelines; returns the failures
+    failures = [result for result in results if result['failed']]
+    unreached = [result['unit'] for result in results if not result['reached']]
+    pairs = stage_pairs(units) - stage_pairs(unreached)
+    print(f"Checked {len(units)} distinct situations ({len(pairs)} stage transitions, "
+          f"{window} switch moments in safe windows) in {seconds:.2f}s")
+    for unit in unreached:
+        print(f"\U000026A0  Not reachable by demand, not run: {describe(unit)}")
+
+    for i, result in enumerate(failures, 1):
+        print(f"\n\U0000274C {describe(result['unit'])}")
+        if result['conflict']:
+            print(f"   conflict: {result['conflict']}")
+        for violation in result['violations']:
+            print(f"   step {violation['step']}: {violation['clearing']} → {violation['entering']} "
+                  f"intergreen {violation['actual']}s < {violation['required']}s")
+        if result['timeline'] is not None:
+            path = os.path.join(out_dir, f"counterexample_{i}.csv")
+            write_timeline(result['timeline'], path)
+            print(f"   counterexample timeline: {path}")
+
+    if failures:
+        print(f"\n\U0000274C {len(failures)} situations violate the safety rules")
+    else:
+        print("\U00002713 No intergreen or conflict violations")
+    return failures
+
+
+if __name__ == '__main__':
+    # python plan_verifier.py [z1_fg311.xml] [--processes N]
+    import time
+
+    xml_path = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else 'z1_fg311.xml'
+    processes = int(sys.argv[sys.argv.index('--processes') + 1]) if '--processes' in sys.argv else None
+
+    start = time.perf_counter()
+    units, window, results = verify(xml_path, processes)
+    sys.exit(1 if report(units, window, results, time.perf_counter() - start) else 0)
@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_right
+
+from main import read_timeline
+from signal_util import OCIT
+from state_bus import StateBus
+
+DARK = OCIT.nameToByte['dunkel']
+
+
+class TimelinePlayer:
+    # Plays a recorded Timeline back onto a StateBus, so the dashboard (or any
+    # other subscriber) shows exactly what the heads showed.
+    #
+    # Time index: every keyframe_interval steps the full state is stored with
+    # the position of the next change in the timeline. state_at(t) starts from
+    # the last keyframe at or before t and applies at most one interval of
+    # changes, so seeking to hour 17 of a day costs the same as seeking to 00:01.
+    def __init__(self, timeline, keyframe_interval=600, bus=None):
+        self.timeline = timeline
+        self.signals = timeline.signals
+        self.keyframe_interval = keyframe_interval
+        self.bus = bus or StateBus(self.signals)
+
+        steps = timeline.steps
+        self.first_step = steps[0] if len(steps) else 0
+        self.last_step = steps[-1] if len(steps) else 0
+
+        self.keyframe_steps = array('I')
+        self.keyframe_positions = array('I')
+        self.keyframe_states = []
+        state = array('B', [DARK]) * len(self.signals)
+        pos = 0
+        for keyframe in range(self.first_step, self.last_step + 1, keyframe_interval):
+            while pos < len(steps) and steps[pos] <= keyframe:
+                state[timeline.slots[pos]] = timeline.codes[pos]
+                pos += 1
+            self.keyframe_steps.append(keyframe)
+            self.keyframe_positions.append(pos)
+            self.keyframe_states.append(bytes(state))
+
+        self.step = self.first_step
+        self.position = 0  # Next timeline entry to apply
+        self.state = array('B', [DARK]) * len(self.signals)
+        self.seek(self.first_step)
+
+    def state_at(self, step):
+        # Full signal state (OCIT codes, one byte per slot) at `step`
+        k = max(0, bisect_right(self.keyframe_steps, step) - 1)
+        state = array('B', self.keyframe_states[k])
+        end = bisect_right(self.timeline.steps, step)
+        slots, codes = self.timeline.slots, self.timeline.codes
+        for pos in range(self.keyframe_positions[k], end):
+            state[slots[pos]] = codes[pos]
+        return state
+
+    def seek(self, step):
+        self.step = step
+        self.state = self.state_at(step)
+        self.position = bisect_right(self.timeline.steps, step)
+        self.bus.publish(self.state, step)
+
+    def advance(self):
+        # One recorded step forward; publishes only if a signal changed
+        self.step += 1
+        steps = self.timeline.steps
+        pos = self.position
+        while pos < len(steps) and steps[pos] <= self.step:
+            self.state[self.timeline.slots[pos]] = self.timeline.codes[pos]
+            pos += 1
+        if pos != self.position:
+            self.position = pos
+            self.bus.publish(self.state, self.step)
+
+    def play(self, speed=1, until=None):
+        # Real-time playback at speed x (1, 10, 100, ...) on absolute deadlines,
+        # so the replay does not drift behind the recording
+        until = self.last_step if until is None else until
+        interval = 1.0 / speed
+        start_step = self.step
+        start = time.monotonic()
+        while self.step < until:
+            deadline = start + (self.step + 1 - start_step) * interval
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.advance()
+
+
+if __name__ == '__main__':
+    # python replay.py timeline_STP_(1-3-2).csv [--speed 1|10|100] [--seek STEP]
+    timeline_path = sys.argv[1] if len(sys.argv) > 1 else 'timeline_STP_(1-3-2).csv'
+    speed = float(sys.argv[sys.argv.index('--speed') + 1]) if '--speed' in sys.argv else 1
+    seek_step = int(sys.argv[sys.argv.index('--seek') + 1]) if '--seek' in sys.argv else None
+
+    print(f"Loading timeline {timeline_path}...")
+    player = TimelinePlayer(read_timeline(timeline_path))
+    print(f"\U00002713 {len(player.timeline)} signal changes, steps {player.first_step}-{player.last_step}")
+
+    from signal_vis import SignalDashboard  # Only needed for the visual replay
+    name = os.path.splitext(os.path.basename(timeline_path))[0]
+    dashboard = SignalDashboard(title=f"Replay {name}")
+    dashboard.add_intersection(name, player.bus)
+    dashboard.start()
+
+    if seek_step is not None:
+        player.seek(seek_step)
+        print(f"\U000023E9 Seek to step {seek_step}")
+    print(f"\U000025B6 Replaying at {speed:g}x...")
+    try:
+        player.play(speed)
+    except KeyboardInterrupt:
+        pass
+    print(f"\U00002713 Replay stopped at step {player.step}")
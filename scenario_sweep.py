@@ -0,0 +1,166 @@
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from main import Controller, parse_stage_sequence
+from model_cache import load_model
+from signal_util import OCIT
+from transitions import compile_transition
+
+# A scenario is a dict:
+#   {'name': 'STP_(1-3-2)->STP_(1-5-4)@17', 'program': 'STP_(1-3-2)',
+#    'switches': [(17, 'STP_(1-5-4)')], 'duration': 400}
+# where each switch is a request_program_switch issued just before that step.
+
+RESULT_COLUMNS = ['scenario', 'start_program', 'target_program', 'requested_step',
+                  'executed_step', 'latency', 'violations', 'signal_changes']
+
+GREEN = OCIT.nameToByte['gruen']
+
+
+def cycle_length(data, program, stage_duration=60):
+    # Seconds for one pass through the program's stage sequence, including
+    # the compiled transitions between the stages
+    sequence = parse_stage_sequence(program, len(data['stages']))
+    total = 0
+    for pos, stage in enumerate(sequence):
+        next_stage = sequence[(pos + 1) % len(sequence)]
+        transition = data['transition_table'].get((stage, next_stage))
+        if transition is None:
+            transition = compile_transition(data, stage, next_stage, allowed=False)
+        total += stage_duration + transition['duration']
+    return total
+
+
+def switch_grid(data, programs=None):
+    # Every (from, to) program pair, with the switch requested at every second
+    # of the start program's cycle
+    programs = programs or list(data['programs'].keys())
+    cycles = {program: cycle_length(data, program) for program in programs}
+    scenarios = []
+    for start in programs:
+        for target in programs:
+            if start == target:
+                continue
+            for second in range(1, cycles[start] + 1):
+                scenarios.append({
+                    'name': f"{start}->{target}@{second}",
+                    'program': start,
+                    'switches': [(second, target)],
+                    'duration': second + cycles[start] + cycles[target],
+                })
+    return scenarios
+
+
+def find_intergreen_violations(timeline, intergreen_matrix):
+    # Walks a Timeline (first entry per signal = initial state) and reports
+    # every green start that comes too early after, or during, the green of a
+    # signal it has an intergreen time with
+    signals = timeline.signals
+    n = len(signals)
+    green_since = [None] * n
+    green_end = [None] * n
+    violations = []
+    for i, (step, slot, code) in enumerate(zip(timeline.steps, timeline.slots, timeline.codes)):
+        if i < n:
+            green_since[slot] = step if code == GREEN else None
+            continue
+        if code == GREEN:
+            if green_since[slot] is not None:
+                continue
+            for other in range(n):
+                required = intergreen_matrix[other * n + slot]
+                if required < 0 or other == slot:
+                    continue
+                if green_since[other] is not None:
+                    violations.append({'step': step, 'clearing': signals[other], 'entering': signals[slot],
+                                       'required': required, 'actual': None})
+                elif green_end[other] is not None and step - green_end[other] < required:
+                    violations.append({'step': step, 'clearing': signals[other], 'entering': signals[slot],
+                                       'required': required, 'actual': step - green_end[other]})
+            green_since[slot] = step
+        elif green_since[slot] is not None:
+            green_since[slot] = None
+            green_end[slot] = step
+    return violations
+
+
+def run_scenario(data, scenario, keep_timeline=True):
+    controller = Controller(data, gui=False, start_program=scenario['program'])
+    timeline = controller.simulate(scenario['duration'], switches=scenario.get('switches'))
+
+    switches = []
+    for requested, executed, old_program, new_program in controller.switch_history:
+        switches.append({'requested': requested, 'executed': executed, 'from': old_program,
+                         'to': new_program, 'latency': executed - requested})
+
+    return {
+        'name': scenario['name'],
+        'program': scenario['program'],
+        'switches': switches,
+        'violations': find_intergreen_violations(timeline, data['intergreen_matrix']),
+        'signal_changes': len(timeline),
+        'timeline': timeline if keep_timeline else None,
+    }
+
+
+_worker_data = None
+_worker_keep_timeline = True
+
+
+def _init_worker(xml_path, keep_timeline):
+    # Each process parses the XML once and reuses it for all its scenarios
+    global _worker_data, _worker_keep_timeline
+    _worker_data = load_model(xml_path)
+    _worker_keep_timeline = keep_timeline
+
+
+def _run_in_worker(scenario):
+    return run_scenario(_worker_data, scenario, keep_timeline=_worker_keep_timeline)
+
+
+def run_sweep(xml_path, scenarios, processes=None, keep_timelines=True):
+    processes = processes or os.cpu_count() or 1
+    chunksize = max(1, len(scenarios) // (processes * 4))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(xml_path, keep_timelines)) as pool:
+        return list(pool.map(_run_in_worker, scenarios, chunksize=chunksize))
+
+
+def results_table(results):
+    # One row per executed switch (or one row for a scenario without any)
+    rows = []
+    for result in results:
+        for switch in result['switches'] or [None]:
+            rows.append([
+                result['name'],
+                result['program'],
+                switch['to'] if switch else None,
+                switch['requested'] if switch else None,
+                switch['executed'] if switch else None,
+                switch['latency'] if switch else None,
+                len(result['violations']),
+                result['signal_changes'],
+            ])
+    return rows
+
+
+def write_results(results, file_path):
+    with open(file_path, mode='w', newline='', encoding='utf-8') as csv_results:
+        writer = csv.writer(csv_results, delimiter=';')
+        writer.writerow(RESULT_COLUMNS)
+        writer.writerows(results_table(results))
+
+
+if __name__ == '__main__':
+    xml_path = sys.argv[1] if len(sys.argv) > 1 else 'z1_fg311.xml'
+    scenarios = switch_grid(load_model(xml_path))
+    print(f"Running {len(scenarios)} switch scenarios on {os.cpu_count()} cores...")
+    results = run_sweep(xml_path, scenarios, keep_timelines=False)
+    write_results(results, 'sweep_results.csv')
+
+    latencies = [switch['latency'] for result in results for switch in result['switches']]
+    violations = sum(len(result['violations']) for result in results)
+    print(f"\U00002713 {len(results)} scenarios, switch latency {min(latencies)}-{max(latencies)}s, {violations} intergreen violations")
+    print("Results written to sweep_results.csv")
@@ -0,0 +1,156 @@
+import heapq
+import re
+from bisect import bisect_right
+from datetime import datetime
+
+# Day / week plan scheduling (LISA Schaltuhr): the week plan names one day
+# plan per weekday, each day plan lists switching points (time of day ->
+# signal program). A week is compiled into one sorted list of
+# (second of the week, program); the SwitchScheduler keeps only the next
+# switching point of every intersection in a heap, so a tick without a due
+# switch costs one comparison, however many intersections and plans it hosts.
+
+WEEKDAYS = ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So']  # datetime.weekday() order
+DAY = 24 * 3600
+WEEK = 7 * DAY
+
+# Switching point fields of a day plan entry: the time of day in Zeitpunkt
+# or Uhrzeit ("06:30", "06:30:00", xs:time) or in Stunde / Minute [/ Sekunde],
+# the program in Signalprogramm or SigProg, by Bezeichnung or by ObjNr
+TIME_FIELDS = ('Zeitpunkt', 'Uhrzeit')
+PROGRAM_FIELDS = ('Signalprogramm', 'SigProg')
+
+CLOCK = re.compile(r'^(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})?$')
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+def parse_clock(text):
+    # "06:30", "06:30:00" or an xs:time/dateTime tail -> seconds of the day
+    match = CLOCK.match((text or '').strip().split('T')[-1])
+    if not match:
+        return None
+    hours, minutes, seconds = (int(value or 0) for value in match.groups())
+    if hours > 23 or minutes > 59 or seconds > 59:
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _entry_second(entry):
+    for field in TIME_FIELDS:
+        if entry.get(field):
+            return parse_clock(entry[field])
+    if entry.get('Stunde') and entry.get('Minute'):
+        text = f"{entry['Stunde'].strip()}:{entry['Minute'].strip().zfill(2)}:{(entry.get('Sekunde') or '0').strip().zfill(2)}"
+        return parse_clock(text)
+    return None
+
+
+def _entry_program(entry, programs, numbers):
+    for field in PROGRAM_FIELDS:
+        value = (entry.get(field) or '').strip()
+        if value in programs:
+            return value
+        if value.isdigit():
+            return numbers.get(int(value))
+    return None
+
+
+def compile_day_plan(data, name):
+    # Sorted [(second of the day, program)] of a day plan; an entry that is not
+    # a switching point with a valid time and a known program raises
+    # ScheduleError, so a Schaltuhr is never silently ignored
+    if name not in data['day_plans']:
+        raise ScheduleError(f"Unknown day plan '{name}'")
+    numbers = {info.get('number'): program for program, info in data['program_info'].items()}
+    points = []
+    for entry in data['day_plans'][name]:
+        second = _entry_second(entry)
+        program = _entry_program(entry, data['programs'], numbers)
+        if second is None or program is None:
+            problem = "no valid time of day" if second is None else "no known program"
+            raise ScheduleError(f"Day plan '{name}': {problem} in switching point {entry}")
+        points.append((second, program))
+    return sorted(points)
+
+
+def compile_week_schedule(data, week_plan=None):
+    # Sorted [(second of the week, program)]; empty when the export has no
+    # switching points (programs then only change on request)
+    week_plans = data.get('week_plans', {})
+    if not week_plans:
+        return []
+    days = week_plans.get(week_plan or 'Default') or next(iter(week_plans.values()))
+    day_points = {None: []}  # A weekday without a day plan has no switching points
+    schedule = []
+    for weekday, day in enumerate(WEEKDAYS):
+        name = days.get(day)
+        if name not in day_points:
+            day_points[name] = compile_day_plan(data, name)
+        schedule.extend((weekday * DAY + second, program) for second, program in day_points[name])
+    return schedule
+
+
+def week_second(when):
+    return when.weekday() * DAY + when.hour * 3600 + when.minute * 60 + when.second
+
+
+def program_at(schedule, second):
+    # Program of the last switching point at or before `second` (from the
+    # previous week if none this week), None without switching points
+    if not schedule:
+        return None
+    i = bisect_right(schedule, (second % WEEK, chr(0x10FFFF)))
+    return schedule[i - 1][1]
+
+
+class SwitchScheduler:
+    # Heap of (due step, seq, intersection, program) holding one entry per
+    # intersection: firing a switch pushes that intersection's next one.
+    # Step 0 is the wall-clock time `start`; a step is one second.
+    def __init__(self, start=None):
+        self.start_second = week_second(start or datetime.now())
+        self.heap = []
+        self.schedules = {}  # name -> (week seconds, programs)
+        self.callbacks = {}  # name -> callback(program)
+        self.fired = 0
+        self._seq = 0
+
+    def align(self, step, now=None):
+        # Makes `step` the current wall-clock second, e.g. for a controller
+        # resumed from a checkpoint; call before add()
+        self.start_second = (week_second(now or datetime.now()) - step) % WEEK
+
+    def add(self, name, schedule, callback, step=0):
+        # callback(program) is called at each switching point after `step`.
+        # It should push a switch into the controller's CommandChannel, e.g.
+        # controller.commands.push(SWITCH, program), not switch the controller
+        # directly: the scheduler may run on another thread or task
+        if not schedule:
+            return False
+        self.schedules[name] = ([second for second, _ in schedule], [program for _, program in schedule])
+        self.callbacks[name] = callback
+        self._push(name, step)
+        return True
+
+    def _push(self, name, step):
+        seconds, programs = self.schedules[name]
+        now = (self.start_second + step) % WEEK
+        i = bisect_right(seconds, now) % len(seconds)
+        delay = (seconds[i] - now) % WEEK or WEEK
+        self._seq += 1
+        heapq.heappush(self.heap, (step + delay, self._seq, name, programs[i]))
+
+    def advance(self, step):
+        # Fires every switching point due at or before `step`
+        heap = self.heap
+        while heap and heap[0][0] <= step:
+            due, _, name, program = heapq.heappop(heap)
+            self.fired += 1
+            self.callbacks[name](program)
+            self._push(name, due)
+
+    def next_due(self):
+        return self.heap[0][0] if self.heap else None
@@ -0,0 +1,150 @@
+from array import array
+
+from signal_util import OCIT
+from transitions import transition_elements
+
+GREEN = OCIT.nameToByte['gruen']
+
+# A signal plan is one LISA Signalprogramm compiled for plan execution:
+#   {'name': 'STP_(1-3-2)', 'cycle_time': 90, 'offset': 0,
+#    'points': [[(second, code), ...] per slot],   # every picture change in the cycle
+#    'events': [((slot, code), ...) per second],    # the same, indexed by cycle second
+#    'initial': bytes,                              # state at cycle second 0
+#    'handover': bytes, 'handover_green': (seconds per slot),  # see _set_handover
+#    'fixed_time': True,
+#    'table': bytes, 'green_prefix': [array('I') per slot]}  # fixed-time only, see below
+# Each Schaltzeitpunkt is expanded with the signal group's Uebergangselemente,
+# which start at the switching time (as in LISA, the intergreen times count
+# from green end to the end of red-amber): 'gruen' at 35 with a 1 s red-amber
+# shows red-amber at 35 and green from 36, 'rot' at 26 shows amber 26-28.
+
+
+def compile_signal_plan(data, program):
+    info = data['program_info'][program]
+    cycle_time = info['cycle_time']
+    code = OCIT.nameToByte
+    first_stage = data['stages'][0]['signals'] if data['stages'] else {}
+    switching_times = data['switching_times'].get(program, {})
+
+    points = []
+    for signal in data['signals']:
+        switches = sorted((t % cycle_time, target) for t, target in switching_times.get(signal, []))
+        if not switches:
+            # Not switched by this program: keeps its first-stage picture all cycle
+            points.append([(0, code[first_stage.get(signal, 'dunkel')])])
+            continue
+        signal_points = []
+        for pos, (t, target) in enumerate(switches):
+            previous = switches[pos - 1][1]
+            elements = transition_elements(data, signal, previous, target)
+            offset = t
+            for color, duration in elements:
+                signal_points.append((offset % cycle_time, code[color]))
+                offset += duration
+            signal_points.append((offset % cycle_time, code[target]))
+        points.append(sorted(signal_points, key=lambda point: point[0]))
+
+    events = [[] for _ in range(cycle_time)]
+    for slot, signal_points in enumerate(points):
+        for second, state in signal_points:
+            events[second].append((slot, state))
+
+    plan = {
+        'name': program,
+        'cycle_time': cycle_time,
+        'offset': info['offset'],
+        'points': points,
+        'events': [tuple(changes) for changes in events],
+        'initial': bytes(_state_at_zero(signal_points) for signal_points in points),
+        'fixed_time': info['fixed_time'],
+        'table': None,
+        'green_prefix': None,
+    }
+    _set_handover(plan)
+    if info['fixed_time']:
+        _compile_cycle_table(plan)
+    return plan
+
+
+def _state_at_zero(signal_points):
+    # Picture at cycle second 0: set at second 0, else carried over from the
+    # last change of the previous cycle
+    at_zero = [state for second, state in signal_points if second == 0]
+    return at_zero[-1] if at_zero else signal_points[-1][1]
+
+
+def _set_handover(plan):
+    # A plan switch takes over at the end of the cycle, before the cycle
+    # start's switch points: 'handover' is the state in the last cycle second,
+    # 'handover_green' how many seconds each slot has been green by then
+    cycle_time = plan['cycle_time']
+    state = array('B', plan['initial'])
+    green = [0] * len(state)
+    for t in range(2 * cycle_time):  # Two cycles, for greens running over the cycle start
+        for slot, code in plan['events'][t % cycle_time]:
+            state[slot] = code
+        green = [seconds + 1 if code == GREEN else 0 for seconds, code in zip(green, state)]
+    plan['handover'] = bytes(state)
+    plan['handover_green'] = tuple(green)
+
+
+def _compile_cycle_table(plan):
+    # A fixed-time plan is a pure function of the cycle second, so the whole
+    # cycle is stored as one table: row t (len(initial) bytes, one OCIT code per
+    # slot) is the state at cycle second t. green_prefix[slot][t] counts the
+    # green seconds of that slot in [0, t).
+    n = len(plan['initial'])
+    cycle_time = plan['cycle_time']
+    state = array('B', plan['initial'])
+    table = array('B')
+    prefix = [array('I', [0]) for _ in range(n)]
+    for second in range(cycle_time):
+        for slot, code in plan['events'][second]:
+            state[slot] = code
+        table.extend(state)
+        for slot in range(n):
+            prefix[slot].append(prefix[slot][-1] + (state[slot] == GREEN))
+    plan['table'] = table.tobytes()
+    plan['green_prefix'] = prefix
+
+
+def state_at(plan, t):
+    # O(1) state of a fixed-time plan t seconds after a cycle start
+    # (as a Controller in plan mode shows at step t)
+    n = len(plan['initial'])
+    row = t % plan['cycle_time'] * n
+    return memoryview(plan['table'])[row:row + n]
+
+
+def states_at(plan, times):
+    # Vectorised state_at for many timestamps: [len(times), signals] OCIT codes.
+    # NumPy is imported here, not at module level, to keep model loading light
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("states_at requires NumPy")
+    table = np.frombuffer(plan['table'], dtype=np.uint8).reshape(plan['cycle_time'], len(plan['initial']))
+    return table[np.asarray(times) % plan['cycle_time']]
+
+
+def green_seconds(plan, start, end):
+    # Green seconds per slot in [start, end), in O(1) per slot from the prefix sums
+    cycle_time = plan['cycle_time']
+    full_cycles, start_second = divmod(start, cycle_time)
+    end_cycles, end_second = divmod(end, cycle_time)
+    cycles = end_cycles - full_cycles
+    return [prefix[-1] * cycles + prefix[end_second] - prefix[start_second] for prefix in plan['green_prefix']]
+
+
+def green_shares(plan, start=0, end=None):
+    # Share of green time per slot over [start, end) (default: one cycle)
+    end = start + plan['cycle_time'] if end is None else end
+    return [seconds / (end - start) for seconds in green_seconds(plan, start, end)]
+
+
+def compile_signal_plans(data):
+    return {
+        program: compile_signal_plan(data, program)
+        for program, info in data['program_info'].items()
+        if info['cycle_time'] > 0 and data['switching_times'].get(program)
+    }
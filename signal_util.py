@@ -1,4 +1,7 @@
 import csv
+import os
+
+OCIT_DEF_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'OCIT_def.csv')
 
 class OCIT_def:
     def __init__(self, file_path):
@@ -18,6 +21,9 @@ class OCIT_def:
             self.codeToASCII,
             self.ASCIIToCode,
         ]
+        # Integer lookups for array-backed signal states
+        self.nameToByte = {}
+        self.byteToName = [None] * 256
 
         with open(file_path, mode='r', newline='', encoding='utf-8') as csv_OCIT_def:
             reader = csv.reader(csv_OCIT_def, delimiter=';')
@@ -29,6 +35,11 @@ class OCIT_def:
                 self.ASCIIToName[row[3]] = row[1]
                 self.codeToASCII[row[2]] = row[3]
                 self.ASCIIToCode[row[3]] = row[2]
+                if row[2].isdigit():
+                    self.nameToByte[row[1]] = int(row[2])
+                    self.byteToName[int(row[2])] = row[1]
+
+OCIT = OCIT_def(OCIT_DEF_FILE)
 
 if __name__ == "__main__":
     csv_OCIT_file_path = 'OCIT_def.csv'
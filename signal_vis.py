@@ -1,153 +1,157 @@
 import tkinter as tk
 import threading
-import queue
 import time
 import re
-from signal_util import OCIT_def
+from signal_util import OCIT, OCIT_def
+from state_bus import StateBus
 from datetime import datetime
 
-class TrafficLightApp:
-    def __init__(self, window, name, switch_interval_queue, signal_wish_queue):
-        scal = 0.75
-        self.window = window
-        self.window.title(name)
+# Farbvariablen
+COLORS = {
+    "rot": '#B81B0E',  # Rot als HEX
+    "gelb": '#F5A900',  # Gelb als HEX
+    "gruen": '#339966',  # Grün als HEX
+    "weiß": '#FFFFFF',  # initialer Zustand: weiß
+    "aus": '#4D4D4D',  # Dunkle Farbe für ausgeschaltete Lichter
+}
+
+#Signalbilder
+SIGNAL_PATTERNS = {
+    "rot": [1, 0, 0, 0, 0], # [rot, gelb, grün, freq[Hz; 0 -> dauer],wbl[1 -> True/ 0 -> False]
+    "rotgelb": [1, 1, 0, 0, 0],
+    "gelb": [0, 1, 0, 0, 0],
+    "gruen": [0, 0, 1, 0, 0],
+    "dunkel": [0, 0, 0, 0, 0],
+    "rotgruen": [1, 0, 1, 0, 0],
+    "gelbgruen": [0, 1, 1, 0, 0],
+    "rotblk": [1, 0, 0, 1, 0],
+    "gelbblk": [0, 1, 0, 1, 0],
+    "gruenblk": [0, 0, 1, 1, 0],
+    "wbl_rotgruen": [1, 0, 1, 1, 1],
+    "wbl_rotgelb": [1, 1, 0, 1, 1],
+    "wbl_gelbgruen": [0, 1, 1, 1, 1],
+    "rotblk2hz": [1, 0, 0, 2, 0],
+    "gelbblk2hz": [0, 1, 0, 2, 0],
+    "gruenblk2hz": [0, 0, 1, 2, 0],
+    "wbl2hz_rotgruen": [1, 0, 1, 2, 1],
+    "wbl2hz_rotgelb": [1, 1, 0, 2, 1],
+    "wbl2hz_gelbgruen": [0, 1, 1, 2, 1],
+}
+
+# Signalbild je OCIT-Code, damit das Dashboard direkt mit dem Zustandsarray arbeitet
+CODE_PATTERNS = [SIGNAL_PATTERNS.get(name, SIGNAL_PATTERNS["dunkel"]) for name in OCIT.byteToName]
+LAMPS = ("rot", "gelb", "gruen")
+
+
+class SignalDashboard:
+    # Ein Tk-Fenster mit einer Leinwand für alle Signalgeber aller Knoten.
+    # Jeder Knoten hängt an einem StateBus; die Tk-Schleife holt sich alle
+    # poll_interval ms den neuesten Zustand und zeichnet nur die Signalgeber
+    # neu, deren Signalbild sich geändert hat oder die blinken.
+    def __init__(self, title="Signalgeber", columns=12, scale=0.25, poll_interval=50):
+        self.title = title
+        self.columns = columns
+        self.scale = scale
+        self.poll_interval = poll_interval  # [ms]
+        self.intersections = []  # (Name, Signalgruppen) in Anzeigereihenfolge
+        self.subscriptions = {}  # Name -> Subscription auf den StateBus des Knotens
+        self.heads = {}  # Name -> je Signalgruppe {'code', 'lamps', 'fills'}
+        self.blinking = set()  # (Name, Slot) der blinkenden Signalgeber
+        self.window = None
+        self.canvas = None
+
+    def add_intersection(self, name, bus):
+        self.intersections.append((name, bus.signals))
+        self.subscriptions[name] = bus.subscribe()
+
+    def start(self):
+        # Die gesamte Visualisierung läuft in genau einem Thread
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        print(f"Initializing signal dashboard for {len(self.intersections)} intersection(s)")
+        return thread
+
+    def run(self):
+        window = tk.Tk()
+        self.build(window)
+        window.mainloop()
+
+    def build(self, window):
+        s = self.scale
+        head_width = s * (65 + 200 + 65)
+        head_height = s * (65 + (200 + 35) * 2 + 200 + 65)
+        label_height = 18
+        title_height = 22
+
+        rows = sum(max(1, -(-len(signals) // self.columns)) for _, signals in self.intersections)
+        widest = max((len(signals) for _, signals in self.intersections), default=1)
+        width = head_width * max(1, min(self.columns, widest))
+        height = (title_height * len(self.intersections)) + rows * (head_height + label_height)
 
-        # Erstelle eine Leinwand, um die Ampel zu zeichnen
-        self.width = scal * (65 + 200 + 65)
-        self.height = scal * (65 + (200 + 35) * 2 + 200 + 65)
-        self.canvas = tk.Canvas(window, width=self.width, height=self.height, bg='black')
+        self.window = window
+        self.window.title(self.title)
+        self.canvas = tk.Canvas(window, width=width, height=height, bg='black')
         self.canvas.pack()
 
-        # Farbvariablen
-        self.colors = {
-            "rot": '#B81B0E',  # Rot als HEX
-            "gelb": '#F5A900',  # Gelb als HEX
-            "gruen": '#339966',  # Grün als HEX
-            "weiß": '#FFFFFF',  # initialer Zustand: weiß
-            "aus": '#4D4D4D',  # Dunkle Farbe für ausgeschaltete Lichter
-        }
-
-        #Signalbilder
-        self.signal_wish_queue = signal_wish_queue
-        self.signal_patterns = {
-            "rot": [1, 0, 0, 0, 0], # [rot, gelb, grün, freq[Hz; 0 -> dauer],wbl[1 -> True/ 0 -> False]
-            "rotgelb": [1, 1, 0, 0, 0],
-            "gelb": [0, 1, 0, 0, 0],
-            "gruen": [0, 0, 1, 0, 0],
-            "dunkel": [0, 0, 0, 0, 0],
-            "rotgruen": [1, 0, 1, 0, 0],
-            "gelbgruen": [0, 1, 1, 0, 0],
-            "rotblk": [1, 0, 0, 1, 0],
-            "gelbblk": [0, 1, 0, 1, 0],
-            "gruenblk": [0, 0, 1, 1, 0],
-            "wbl_rotgruen": [1, 0, 1, 1, 1],
-            "wbl_rotgelb": [1, 1, 0, 1, 1],
-            "wbl_gelbgruen": [0, 1, 1, 1, 1],
-            "rotblk2hz": [1, 0, 0, 2, 0],
-            "gelbblk2hz": [0, 1, 0, 2, 0],
-            "gruenblk2hz": [0, 0, 1, 2, 0],
-            "wbl2hz_rotgruen": [1, 0, 1, 2, 1],
-            "wbl2hz_rotgelb": [1, 1, 0, 2, 1],
-            "wbl2hz_gelbgruen": [0, 1, 1, 2, 1],
-        }
-
-        # Queue für das Farbwechselintervall
-        self.switch_interval_queue = switch_interval_queue
-        self.current_interval = 10  # [ms] Standardintervall
-
-        # Initialisiere Ampellichter
-        self.lights = {
-            "rot": self.canvas.create_oval(scal * 65, scal * 65, scal * 265, scal * 265, fill=self.colors["aus"]),
-            "gelb": self.canvas.create_oval(scal * 65, scal * 300, scal * 265, scal * 500, fill=self.colors["aus"]),
-            "gruen": self.canvas.create_oval(scal * 65, scal * 535, scal * 265, scal * 735, fill=self.colors["aus"])
-        }
-        self.lights_no = {
-            1: "rot",
-            2: "gelb",
-            3: "gruen",
-        }
-        self.signal_wish = 'gelbblk'
-        self.signal_wish_controll = 'dunkel'
-
-        #initialsiere freq, wbl
-        self.freq_val = False
-        self.wbl_val = "dunkel"
-
-        # Starte den Farbwechsel
-        self.update_light()
-        print(f"Initializing signal vis for {name}- Done")
-
-    def update_light(self):
-        # Überprüfe, ob ein neues Intervall in der Queue ist
-        try:
-            self.current_interval = self.switch_interval_queue.get()
-        except:
-            pass
-
-        # Nur versorgte Farben nutzen
-        try:
-            self.signal_wish = self.signal_wish_queue.get()
-        except queue.Empty:
-            self.signal_wish = 'dunkel'
-        if not self.signal_wish_controll == self.signal_wish:
-            print(f'Signalbild: {self.signal_wish}')
-            self.signal_wish_controll = self.signal_wish
-
-        # Setze alle Lichter auf AUS
-        for light in self.lights.values():
-            self.canvas.itemconfig(light, fill=self.colors["aus"])
-
-        # Definiere das gewünschte Signalbild
-        var = self.signal_patterns[self.signal_wish]
-        rot = bool(var[0])
-        gelb = bool(var[1])
-        gruen = bool(var[2])
+        y = 0
+        for name, signals in self.intersections:
+            self.canvas.create_text(5, y + title_height / 2, text=name, fill=COLORS["weiß"], anchor='w')
+            y += title_height
+            heads = []
+            for slot, signal in enumerate(signals):
+                row, col = divmod(slot, self.columns)
+                x0 = col * head_width
+                y0 = y + row * (head_height + label_height)
+                lamps = [
+                    self.canvas.create_oval(x0 + s * 65, y0 + s * (65 + 235 * i), x0 + s * 265, y0 + s * (265 + 235 * i), fill=COLORS["aus"])
+                    for i in range(len(LAMPS))
+                ]
+                self.canvas.create_text(x0 + head_width / 2, y0 + head_height + label_height / 2, text=signal, fill=COLORS["weiß"])
+                heads.append({'code': None, 'lamps': lamps, 'fills': [COLORS["aus"]] * len(LAMPS)})
+            self.heads[name] = heads
+            y += max(1, -(-len(signals) // self.columns)) * (head_height + label_height)
+
+        self.refresh()
+
+    def refresh(self):
+        now = time.monotonic()
+        for name, heads in self.heads.items():
+            snapshot = self.subscriptions[name].latest()
+            if snapshot is None:
+                continue
+            for slot, code in enumerate(snapshot.state[:len(heads)]):
+                if heads[slot]['code'] != code:
+                    heads[slot]['code'] = code
+                    self._draw_head(name, slot, now)
+
+        for name, slot in list(self.blinking):
+            self._draw_head(name, slot, now)
+
+        self.window.after(self.poll_interval, self.refresh)
+
+    def _draw_head(self, name, slot, now):
+        head = self.heads[name][slot]
+        var = CODE_PATTERNS[head['code']]
+        lit = [lamp for lamp, on in enumerate(var[:3]) if on]
         freq = int(var[3])
-        wbl = bool(var [4])
+        wbl = bool(var[4])
 
-        #setze das gewünschte Signalbild
         if freq > 0:
-            self.current_interval = int(1000/(freq*2)) #1000ms durch Frezquenz des gesamten Zyklus
-            for light_no in self.lights_no.keys():
-                if bool(var[light_no - 1]):
-                    if not self.wbl_val == self.lights[self.lights_no[light_no]]:
-                        self.canvas.itemconfig(self.lights[self.lights_no[light_no]],
-                                               fill=self.colors[self.lights_no[light_no]])
-                        self.wbl_val = self.lights[self.lights_no[light_no]]
-                        break
-                    elif not wbl:
-                        self.wbl_val = "dunkel"
-                        break
-
+            self.blinking.add((name, slot))
+            phase = int(now * freq * 2) % 2  # Halbperioden seit Start der Uhr
+            if wbl:
+                lit = [lit[phase % len(lit)]] if lit else []
+            elif phase:
+                lit = []
         else:
-            if rot:
-                self.canvas.itemconfig(self.lights['rot'], fill=self.colors['rot'])
-            if gelb:
-                self.canvas.itemconfig(self.lights['gelb'], fill=self.colors['gelb'])
-            if gruen:
-                self.canvas.itemconfig(self.lights['gruen'], fill=self.colors['gruen'])
-
-        # Rufe diese Methode nach dem aktuellen Intervall erneut auf
-        self.window.after(self.current_interval, self.update_light)
-
-def run_traffic_light_app(name, switch_interval_queue, signal_wish_queue):
-    window = tk.Tk()
-    app = TrafficLightApp(window, name=name, switch_interval_queue=switch_interval_queue, signal_wish_queue=signal_wish_queue)
-    window.mainloop()
-
-def init_signal_vis(name):
-    color_switch_interval_queue = queue.Queue(maxsize=1)
-    signal_wish_queue = queue.Queue(maxsize=1)
-    color_switch_interval_queue.put(10)
-    signal_wish_queue.put("dunkel")
-
-    # Starte die TrafficLightApp in einem separaten Thread
-    thread = threading.Thread(target=run_traffic_light_app, args=(name, color_switch_interval_queue,signal_wish_queue))
-    thread.daemon = True
-    thread.start()
-    print(f"Initializing signal vis for {name}")
-
-    return color_switch_interval_queue, signal_wish_queue
+            self.blinking.discard((name, slot))
+
+        for lamp, item in enumerate(head['lamps']):
+            fill = COLORS[LAMPS[lamp]] if lamp in lit else COLORS["aus"]
+            if head['fills'][lamp] != fill:
+                head['fills'][lamp] = fill
+                self.canvas.itemconfig(item, fill=fill)
+
 
 def test_routine_1(Startzeit, Signaldauer: int, OCIT_Signale: dict) -> int:
     index = int(((time.time() - Startzeit) % ((len(OCIT_Signale) - 1) * Signaldauer)) / Signaldauer)
@@ -171,7 +175,10 @@ def listen_for_input(input_queue):
         input_queue.append(user_input)
 
 if __name__ == "__main__":
-    color_switch_interval_queue, signal_wish_queue = init_signal_vis("K_Test")
+    signal_bus = StateBus(["K_Test"])
+    dashboard = SignalDashboard(title="K_Test", scale=0.75)
+    dashboard.add_intersection("K_Test", signal_bus)
+    dashboard.start()
 
     # Hier läuft weiterer Code, der die Intervalle steuert
     start_time = time.time()
@@ -205,8 +212,6 @@ if __name__ == "__main__":
 
     while True:
         while round(time.time(),2) * zeitkonstante % 1 == 0:
-            signal_update_interval = 10
-            color_switch_interval_queue.put(signal_update_interval)
             if input_queue:
                 cmd = input_queue.pop(0)
                 cmd = re.sub(r'[^a-z0-9]', '', cmd.lower()) #Entfernt alle Zeichen außer Buchstaben (welche alle klein werden) oder Zahlen
@@ -233,6 +238,8 @@ if __name__ == "__main__":
                     Signalwunsch = OCIT_signals[str(test_routine_1(start_time, Signaldauer, OCIT_signals))]
             elif cmd == "szp1":
                 Signalwunsch = SZP_builder(start_time, Signaldef_SZP1)
-            signal_wish_queue.put(Signalwunsch)
+            if signal_bus.latest() is None or OCIT.byteToName[signal_bus.latest().state[0]] != Signalwunsch:
+                print(f'Signalbild: {Signalwunsch}')
+                signal_bus.publish(bytes([OCIT.nameToByte[Signalwunsch]]))
 
             time.sleep(0.15)  # Warte, bevor das Intervall erneut geändert wird -> Die Zeitkonstante funktioniert aktuell nicht
\ No newline at end of file
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# One immutable picture of an intersection. state is a bytes copy of the
+# controller's OCIT code array (one byte per signal slot), so consumers can
+# keep a snapshot as long as they like while the controller moves on.
+StateSnapshot = namedtuple('StateSnapshot', ['seq', 'step', 'time', 'program', 'stage', 'state'])
+
+
+class StateBus:
+    # Latest-value publish/subscribe channel between one controller and any
+    # number of consumers (GUI, logger, network exporter). publish() never
+    # waits for a consumer: it replaces the latest snapshot and appends to a
+    # bounded history, dropping the oldest entry when the history is full.
+    def __init__(self, signals, history=1024):
+        self.signals = list(signals)
+        self.seq = 0
+        self._latest = None
+        self._history = deque(maxlen=history)
+        self._lock = threading.Lock()  # Held only to swap references, never while consuming
+
+    def publish(self, state, step=None, program=None, stage=None):
+        with self._lock:
+            self.seq += 1
+            snapshot = StateSnapshot(self.seq, step, time.monotonic(), program, stage, bytes(state))
+            self._history.append(snapshot)
+            self._latest = snapshot
+        return snapshot
+
+    def latest(self):
+        return self._latest
+
+    def history(self, since=0):
+        # Snapshots newer than seq `since` still held in the history, oldest first
+        with self._lock:
+            snapshots = list(self._history)
+        return [snapshot for snapshot in snapshots if snapshot.seq > since]
+
+    def subscribe(self):
+        return Subscription(self)
+
+
+class Subscription:
+    # A consumer's read position on a StateBus; each consumer polls on its
+    # own schedule and only sees what it has not read yet
+    def __init__(self, bus):
+        self.bus = bus
+        self.seq = 0
+        self.missed = 0  # Snapshots that fell out of the history before being read
+
+    def latest(self):
+        # Newest snapshot if there is one this subscriber has not seen, else None
+        snapshot = self.bus.latest()
+        if snapshot is None or snapshot.seq == self.seq:
+            return None
+        self.seq = snapshot.seq
+        return snapshot
+
+    def poll(self):
+        snapshots = self.bus.history(self.seq)
+        if snapshots:
+            self.missed += snapshots[0].seq - self.seq - 1
+            self.seq = snapshots[-1].seq
+        return snapshots
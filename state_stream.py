@@ -0,0 +1,221 @@
+import asyncio
+import json
+import struct
+import sys
+
+from ocit_frame import FrameCodec, decode_frame, frame_size
+
+# Live state of every intersection hosted by a ControllerRuntime, streamed
+# over TCP or a Unix socket to any number of subscribers (traffic management
+# centre, wall displays). Messages in both directions:
+#   type (1 byte) | payload length (uint32) | payload
+#   'H' server -> client, once: JSON {"intersections": [{name, node, signals, programs}]}
+#   'S' server -> client: tick (uint32), frame count (uint16), then per frame
+#       the intersection index (uint16) and an ocit_frame state frame
+#   'C' client -> server: a command line as for the runtime, e.g. "311 STP_(1-5-4)"
+#   'R' server -> client: the command's reply text
+# Once per tick, the state of each intersection that changed is encoded once
+# and handed to every client. A client's writer sends whatever is pending as
+# one batch; while it waits for a slow client, newer frames of the same
+# intersection replace the pending one (coalescing), so the control loop never
+# waits on the network.
+MESSAGE = struct.Struct('<cI')
+BATCH = struct.Struct('<IH')
+INDEX = struct.Struct('<H')
+
+
+def pack_message(kind, payload):
+    return MESSAGE.pack(kind, len(payload)) + payload
+
+
+class _Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = {}  # Intersection index -> latest unsent frame
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.coalesced = 0  # Frames replaced before they could be sent
+
+    def offer(self, index, frame):
+        if index in self.pending:
+            self.coalesced += 1
+        self.pending[index] = frame
+        self.ready.set()
+
+
+class StateStreamServer:
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.names = list(runtime.controllers)
+        self.subscriptions = [runtime.controllers[name].bus.subscribe() for name in self.names]
+        codecs = {}
+        self.codecs = []
+        for name in self.names:
+            data = runtime.controllers[name].data
+            self.codecs.append(codecs.setdefault(id(data), FrameCodec(data)))
+        # Latest encoded frame per intersection, sent to every new client first
+        self.latest = [codec.encode(runtime.controllers[name].state, runtime.controllers[name].step,
+                                    runtime.controllers[name].current_program)
+                       for name, codec in zip(self.names, self.codecs)]
+        self.clients = set()
+        self.tick = 0
+
+    def hello(self):
+        intersections = [{'name': name, 'node': codec.node, 'signals': codec.signals, 'programs': codec.programs}
+                         for name, codec in zip(self.names, self.codecs)]
+        return pack_message(b'H', json.dumps({'intersections': intersections}).encode())
+
+    def collect(self):
+        # One pass per tick: encode each changed intersection once, hand it to all clients
+        self.tick += 1
+        for index, subscription in enumerate(self.subscriptions):
+            snapshot = subscription.latest()
+            if snapshot is None:
+                continue
+            frame = self.codecs[index].encode_snapshot(snapshot)
+            self.latest[index] = frame
+            for client in self.clients:
+                client.offer(index, frame)
+
+    async def run(self):
+        # Collects on the runtime's tick, half a tick after the controllers' steps
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        step = 0
+        while True:
+            delay = start + (step + 0.5) * self.runtime.tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.collect()
+            step += 1
+
+    async def _send(self, client):
+        writer = client.writer
+        while True:
+            await client.ready.wait()
+            client.ready.clear()
+            pending, client.pending = client.pending, {}
+            parts = [BATCH.pack(self.tick, len(pending))]
+            for index, frame in pending.items():
+                parts.append(INDEX.pack(index))
+                parts.append(frame)
+            writer.write(pack_message(b'S', b''.join(parts)))
+            client.sent += len(pending)
+            await writer.drain()  # Only this client's writer waits; frames keep coalescing meanwhile
+
+    async def _handle(self, reader, writer):
+        client = _Client(writer)
+        writer.write(self.hello())
+        for index, frame in enumerate(self.latest):
+            if frame is not None:
+                client.offer(index, frame)  # Current state right away
+        self.clients.add(client)
+        sender = asyncio.ensure_future(self._send(client))
+        try:
+            while True:
+                kind, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+                payload = await reader.readexactly(length)
+                if kind == b'C':
+                    reply = self.runtime.handle_line(payload.decode(errors='replace'))
+                    writer.write(pack_message(b'R', reply.encode()))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8312, path=None):
+        # TCP on host:port, or a Unix socket at `path`
+        if path:
+            server = await asyncio.start_unix_server(self._handle, path)
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+        collector = asyncio.ensure_future(self.run())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            collector.cancel()
+
+
+class StateStreamClient:
+    # Stand-in subscriber: receives the hello and state batches, sends commands
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.intersections = []
+
+    async def connect(self, host='127.0.0.1', port=8312, path=None):
+        if path:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        kind, payload = await self.receive()
+        self.intersections = json.loads(payload)['intersections']
+
+    async def receive(self):
+        kind, length = MESSAGE.unpack(await self.reader.readexactly(MESSAGE.size))
+        return kind, await self.reader.readexactly(length)
+
+    def send(self, command):
+        self.writer.write(pack_message(b'C', command.encode()))
+
+    def decode_batch(self, payload):
+        # [(intersection name, program name, Frame)]; frame states are memoryviews into payload
+        tick, count = BATCH.unpack_from(payload)
+        offset = BATCH.size
+        frames = []
+        for _ in range(count):
+            index, = INDEX.unpack_from(payload, offset)
+            offset += INDEX.size
+            frame = decode_frame(payload, offset)
+            offset += frame_size(payload, offset)
+            intersection = self.intersections[index]
+            program = intersection['programs'][frame.program] if frame.program < len(intersection['programs']) else None
+            frames.append((intersection['name'], program, frame))
+        return frames
+
+    async def messages(self):
+        # Yields ('state', [(name, program, Frame)]) and ('reply', text) until the server closes
+        while True:
+            try:
+                kind, payload = await self.receive()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            if kind == b'S':
+                yield 'state', self.decode_batch(payload)
+            elif kind == b'R':
+                yield 'reply', payload.decode()
+
+    def close(self):
+        self.writer.close()
+
+
+if __name__ == '__main__':
+    # python state_stream.py [--port P | --unix PATH] ["<intersection> <program>"]
+    from signal_util import OCIT
+
+    port = int(sys.argv[sys.argv.index('--port') + 1]) if '--port' in sys.argv else 8312
+    path = sys.argv[sys.argv.index('--unix') + 1] if '--unix' in sys.argv else None
+    commands = [arg for arg in sys.argv[1:] if ' ' in arg]
+
+    async def main():
+        client = StateStreamClient()
+        await client.connect(port=port, path=path)
+        signals = {intersection['name']: intersection['signals'] for intersection in client.intersections}
+        print(f"\U00002713 Connected: {', '.join(signals)}")
+        for command in commands:
+            client.send(command)
+        async for kind, message in client.messages():
+            if kind == 'reply':
+                print(message)
+                continue
+            for name, program, frame in message:
+                colours = " | ".join(f"{signal}:{OCIT.byteToName[code]}" for signal, code in zip(signals[name], frame.state))
+                print(f"[{frame.tick:06d}] {name} {program}: {colours}")
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+XML_PATH = os.path.join(ROOT, 'z1_fg311.xml')
+
+
+@pytest.fixture(scope='session')
+def xml_path():
+    return XML_PATH
+
+
+@pytest.fixture(scope='session')
+def data():
+    # Shared by every test: tests copy it before changing anything
+    from model_cache import load_model
+    return load_model(XML_PATH)
@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from main import Controller
+
+pytest.importorskip('numpy')
+
+
+def test_batch_engine_matches_the_controller_with_program_switches(data):
+    from batch_engine import BatchEngine
+    programs = list(data['programs'])
+    engine = BatchEngine([data] * len(programs), start_programs=programs)
+    controllers = [Controller(data, gui=False, start_program=program) for program in programs]
+    for controller in controllers:
+        controller.verbose = False
+
+    rng = random.Random(311)
+    for step in range(1, 5001):
+        for i, controller in enumerate(controllers):
+            if rng.random() < 0.01:  # A switch request every 100 s on average, some while one is pending
+                program = rng.choice(programs)
+                assert engine.request_program_switch(i, program) == controller.request_program_switch(program)
+        state = engine.advance()
+        for i, controller in enumerate(controllers):
+            controller.advance(step)
+            assert bytes(state[i][:len(controller.state)]) == bytes(controller.state), f"intersection {i}, step {step}"
+    assert all(len(controller.switch_history) > 5 for controller in controllers)
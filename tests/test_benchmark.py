@@ -0,0 +1,19 @@
+from benchmark import compare
+
+
+def run(results, noise=None):
+    return {'meta': {}, 'results': results, 'noise': noise or {}}
+
+
+def test_compare_flags_changes_beyond_threshold_and_noise():
+    baseline = run({'x1.parse_ms': 10.0, 'x1.stage_ticks_per_s': 1000.0, 'x1.peak_memory_kb': 200.0},
+                   {'x1.parse_ms': 0.02, 'x1.stage_ticks_per_s': 0.02})
+    results = run({'x1.parse_ms': 13.0, 'x1.stage_ticks_per_s': 700.0, 'x1.peak_memory_kb': 210.0},
+                  {'x1.parse_ms': 0.02, 'x1.stage_ticks_per_s': 0.02})
+    assert [name for name, *_ in compare(results, baseline)] == ['x1.parse_ms', 'x1.stage_ticks_per_s']
+
+
+def test_compare_ignores_changes_within_the_measured_noise():
+    baseline = run({'x1.parse_ms': 10.0, 'x1.stage_ticks_per_s': 1000.0}, {'x1.parse_ms': 0.2})
+    results = run({'x1.parse_ms': 13.0, 'x1.stage_ticks_per_s': 1200.0}, {'x1.stage_ticks_per_s': 0.05})
+    assert compare(results, baseline) == []
@@ -0,0 +1,53 @@
+import pytest
+
+from checkpoint import CheckpointError, checkpoint, fork, read_checkpoint, restore, write_checkpoint
+from main import Controller
+
+
+def quiet(controller):
+    controller.verbose = False
+    return controller
+
+
+@pytest.mark.parametrize('mode', ['stages', 'plan'])
+def test_restore_continues_exactly_like_the_original(data, mode, tmp_path):
+    program = list(data['programs'])[1]
+    original = quiet(Controller(data, gui=False, mode=mode))
+    original.simulate(500, switches=[(450, program)])  # Checkpoint with a switch pending or in progress
+    path = str(tmp_path / 'controller.ck')
+    write_checkpoint(original, path)
+
+    restored = quiet(Controller(data, gui=False, mode=mode))
+    restore(restored, read_checkpoint(path))
+    assert restored.step == original.step
+    assert bytes(restored.state) == bytes(original.state)
+
+    expected = original.simulate(3000)
+    assert list(restored.simulate(3000)) == list(expected)
+    assert restored.switch_history == original.switch_history
+
+
+def test_fork_starts_independent_controllers(data):
+    original = quiet(Controller(data, gui=False))
+    original.simulate(200)
+    first, second = fork(checkpoint(original), data, 2)
+    first.request_program_switch(list(data['programs'])[2])
+    first.simulate(300)
+    second.simulate(300)
+    assert first.current_program != second.current_program
+
+
+def test_restore_refuses_another_mode(data):
+    blob = checkpoint(quiet(Controller(data, gui=False, mode='plan')))
+    with pytest.raises(CheckpointError):
+        restore(quiet(Controller(data, gui=False)), blob)
+
+
+def test_restore_refuses_another_layout(data):
+    blob = checkpoint(quiet(Controller(data, gui=False)))
+    other = dict(data)
+    other['programs'] = dict(reversed(list(data['programs'].items())))
+    with pytest.raises(CheckpointError):
+        restore(quiet(Controller(other, gui=False)), blob)
+    with pytest.raises(CheckpointError):
+        restore(quiet(Controller(data, gui=False)), b'VSCK' + bytes([0]) + blob[5:])
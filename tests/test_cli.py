@@ -0,0 +1,13 @@
+import pytest
+
+from cli import build_parser
+
+
+def test_seconds_only_for_commands_that_run_steps():
+    parser = build_parser()
+    assert parser.parse_args(['run']).seconds == 180
+    assert parser.parse_args(['simulate', '--seconds', '60']).seconds == 60
+    assert parser.parse_args(['bench']).seconds == 24 * 3600
+    assert not hasattr(parser.parse_args(['verify']), 'seconds')
+    with pytest.raises(SystemExit):
+        parser.parse_args(['verify', '--seconds', '60'])
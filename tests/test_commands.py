@@ -0,0 +1,57 @@
+import threading
+
+from commands import SWITCH, CommandChannel
+from main import Controller
+
+
+def test_concurrent_producers_lose_no_command():
+    channel = CommandChannel()
+
+    def produce(source):
+        for i in range(1000):
+            channel.push(SWITCH, i, source=source)
+
+    threads = [threading.Thread(target=produce, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    commands = []
+    while any(thread.is_alive() for thread in threads) or channel:
+        commands.extend(channel.drain())
+    for thread in threads:
+        thread.join()
+    commands.extend(channel.drain())
+
+    assert len(commands) == channel.received == 8000
+    for source in range(8):
+        assert [c['argument'] for c in commands if c['source'] == source] == list(range(1000))
+
+
+def test_priority_commands_are_applied_last():
+    channel = CommandChannel()
+    channel.push(SWITCH, 'a')
+    channel.push(SWITCH, 'b', priority=True)
+    channel.push(SWITCH, 'c')
+    assert [command['argument'] for command in channel.drain()] == ['a', 'c', 'b']
+
+
+def test_controller_applies_commands_at_the_next_step(data):
+    programs = list(data['programs'])
+    controller = Controller(data, gui=False)
+    controller.verbose = False
+    controller.commands.push(SWITCH, programs[2], priority=True)
+    controller.commands.push(SWITCH, programs[1])
+    controller.commands.push(SWITCH, 'no such program')
+    assert controller.pending_program_switch is None  # Nothing happens until the controller steps
+
+    controller.advance(1)
+    assert controller.pending_program_switch == programs[2]  # The priority request is applied last
+    assert (controller.commands.rejected, controller.commands.superseded) == (1, 1)
+
+    controller.commands.push(SWITCH, programs[1])
+    controller.advance(2)
+    assert controller.pending_program_switch == programs[2]  # Not overridden by a later ordinary request
+    assert controller.commands.rejected == 2
+
+    controller.simulate(200)
+    assert controller.current_program == programs[2]
+    assert controller.commands.effect.count == 1
@@ -0,0 +1,32 @@
+import pytest
+
+from conflict_monitor import FLASHING_AMBER
+from main import Controller
+
+
+def with_conflict(data, first, second):
+    # Copy of the model with an extra conflict between two signal groups
+    data = dict(data)
+    masks = list(data['conflict_masks'])
+    i, j = data['signals'].index(first), data['signals'].index(second)
+    masks[i] |= 1 << j
+    masks[j] |= 1 << i
+    data['conflict_masks'] = masks
+    return data
+
+
+@pytest.mark.parametrize('mode', ['stages', 'plan'])
+def test_conflict_falls_back_to_flashing_amber(data, mode):
+    controller = Controller(with_conflict(data, 'K1', 'K2'), gui=False, mode=mode)
+    controller.verbose = False
+    controller.simulate(400)
+
+    assert controller.fault
+    assert all(code == FLASHING_AMBER for code in controller.state)
+    assert not controller.in_transition
+    assert controller.transition is None
+
+    # Later steps, and switch requests, leave the junction in flashing amber
+    controller.request_program_switch(next(p for p in data['programs'] if p != controller.current_program))
+    controller.simulate(400)
+    assert all(code == FLASHING_AMBER for code in controller.state)
@@ -0,0 +1,18 @@
+import os
+
+from main import program_log_path
+
+
+def test_program_log_path_splits_only_the_file_extension():
+    assert program_log_path('events.jsonl', 'STP_(1-3-2)') == 'events_STP_(1-3-2).jsonl'
+    assert program_log_path('events', 'STP_(1-3-2)') == 'events_STP_(1-3-2)'
+    path = os.path.join('runs.jsonl', 'events.log')
+    assert program_log_path(path, 'STP_(1-5-4)') == os.path.join('runs.jsonl', 'events_STP_(1-5-4).log')
+
+
+def test_each_program_logs_to_its_own_file(data, tmp_path):
+    from main import run_headless
+    log_path = str(tmp_path / 'events')
+    run_headless(data, seconds=120, log_path=log_path, out_dir=str(tmp_path))
+    logs = sorted(name for name in os.listdir(tmp_path) if name.startswith('events'))
+    assert logs == sorted(f"events_{program}" for program in data['programs'])
@@ -0,0 +1,45 @@
+import pytest
+
+from main import Controller
+from ocit_frame import HEADER, FrameCodec, FrameError, FrameRecorder, decode_frame, frame_size, iter_frames, read_frames
+
+
+def test_encode_decode_round_trip(data):
+    codec = FrameCodec(data)
+    controller = Controller(data, gui=False)
+    program = list(data['programs'])[1]
+    frame = codec.encode(controller.state, 1234, program, 2)
+
+    assert len(frame) == HEADER.size + len(data['signals']) == frame_size(frame)
+    decoded = codec.decode(frame)
+    assert (decoded.program, decoded.stage, decoded.tick) == (program, 2, 1234)
+    assert bytes(decoded.state) == bytes(controller.state)
+    assert isinstance(decoded.state, memoryview)  # Zero-copy
+    assert codec.decode(codec.encode(controller.state, 0)).program is None
+
+
+def test_corrupt_frames_raise(data):
+    codec = FrameCodec(data)
+    frame = codec.encode(bytes(len(codec.signals)), 1)
+    with pytest.raises(FrameError):
+        decode_frame(b'XXXX' + frame[4:])
+    with pytest.raises(FrameError):
+        decode_frame(frame[:-1])
+
+
+def test_recording_round_trip(data, tmp_path):
+    codec = FrameCodec(data)
+    controller = Controller(data, gui=False)
+    controller.verbose = False
+    path = str(tmp_path / 'states.bin')
+    expected = []
+    with FrameRecorder(path, codec, buffer_frames=16) as recorder:  # Flushes several times
+        for step in range(1, 101):
+            controller.advance(step)
+            recorder.record(controller.state, step, controller.current_program)
+            expected.append((step, bytes(controller.state)))
+
+    frames = read_frames(path)
+    assert [(frame.tick, bytes(frame.state)) for frame in frames] == expected
+    with open(path, 'rb') as recording:
+        assert len(list(iter_frames(recording.read()))) == 100
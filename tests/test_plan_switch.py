@@ -0,0 +1,42 @@
+import itertools
+
+from main import Controller
+
+GREEN = 'gruen'
+
+
+def legal_steps(data, signal):
+    # Colour changes the signal group's Uebergangselemente allow
+    steps = set()
+    for (old_color, new_color), elements in data['signal_groups'][signal]['transitions'].items():
+        colors = [old_color] + [color for color, _ in elements] + [new_color]
+        steps.update(zip(colors, colors[1:]))
+    return steps
+
+
+def signal_histories(timeline):
+    # {signal: [(step, color), ...]} without repeated pictures
+    histories = {}
+    for step, signal, color in timeline:
+        history = histories.setdefault(signal, [])
+        if not history or history[-1][1] != color:
+            history.append((step, color))
+    return histories
+
+
+def test_plan_switches_keep_colour_sequences_and_minimum_greens(data):
+    plans = data['signal_plans']
+    for program, target in itertools.permutations(plans, 2):
+        controller = Controller(data, gui=False, start_program=program, mode='plan', on_conflict='raise')
+        seconds = 2 * plans[program]['cycle_time'] + 2 * plans[target]['cycle_time']
+        timeline = controller.simulate(seconds, switches=[(plans[program]['cycle_time'] + 1, target)])
+        assert controller.current_program == target
+
+        for signal, history in signal_histories(timeline).items():
+            steps = legal_steps(data, signal)
+            min_green = data['signal_groups'][signal]['min_green'] or 1
+            for (step, color), (next_step, next_color) in zip(history, history[1:]):
+                where = f"{program} → {target}: {signal} {color} → {next_color} at step {next_step}"
+                assert (color, next_color) in steps, where
+                if color == GREEN and step > 0:  # A green shown from the start has no known begin
+                    assert next_step - step >= min_green, f"{where}, green for {next_step - step}s"
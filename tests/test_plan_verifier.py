@@ -0,0 +1,25 @@
+
+from main import parse_stage_sequence
+from plan_verifier import enumerate_units, run_unit, stage_pairs
+
+
+def test_units_cover_every_stage_pair_of_each_program(data):
+    units, _ = enumerate_units(data)
+    expected = set()
+    for program in data['programs']:
+        sequence = parse_stage_sequence(program, len(data['stages']))
+        expected |= {(a, b) for a in sequence for b in sequence if a != b}
+    assert expected <= stage_pairs(units)
+    # Stages skipped by an actuated controller, not in any sequence or switch unit
+    assert {(0, 1), (1, 2), (2, 0), (4, 0)} <= stage_pairs([unit for unit in units if unit['kind'] == 'skip'])
+
+
+def test_every_unit_is_reached_without_violations(data):
+    units, _ = enumerate_units(data)
+    for unit in units:
+        result = run_unit(data, unit)
+        assert result['reached'], unit
+        assert not result['failed'], unit
+        if unit['kind'] in ('sequence', 'skip'):
+            # The stage transitions the unit stands for were really run
+            assert set(unit['pairs']) <= result['transitions'], unit
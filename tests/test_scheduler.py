@@ -0,0 +1,91 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from scheduler import DAY, ScheduleError, compile_week_schedule, program_at
+
+
+def with_day_plan(data, entries):
+    data = dict(data)
+    data['day_plans'] = {'Default': entries}
+    return data
+
+
+def test_example_export_has_no_switching_points(data):
+    assert compile_week_schedule(data) == []
+
+
+def test_switching_points_by_time_fields_and_program_objnr(data):
+    # ObjNr of STP_(1-5-4) is 4, not its position in the export
+    schedule = compile_week_schedule(with_day_plan(data, [
+        {'Stunde': '6', 'Minute': '30', 'SigProg': '4'},
+        {'Zeitpunkt': '22:00:00', 'Signalprogramm': 'STP_(1-3-2)'},
+    ]))
+    assert schedule[:2] == [(6 * 3600 + 1800, 'STP_(1-5-4)'), (22 * 3600, 'STP_(1-3-2)')]
+    assert len(schedule) == 14
+    assert program_at(schedule, DAY + 12 * 3600) == 'STP_(1-5-4)'
+
+
+@pytest.mark.parametrize('entry', [
+    {'Zeit': '7', 'Programm': '1'},
+    {'Zeitpunkt': '25:00', 'SigProg': '1'},
+    {'Stunde': '6', 'Minute': '30', 'SigProg': '2'},
+])
+def test_invalid_switching_points_raise(data, entry):
+    with pytest.raises(ScheduleError):
+        compile_week_schedule(with_day_plan(data, [entry]))
+
+
+def test_unknown_day_plan_raises(data):
+    data = dict(data)
+    data['week_plans'] = {'Default': {'Mo': 'Werktag'}}
+    with pytest.raises(ScheduleError):
+        compile_week_schedule(data)
+
+
+def export_with_schaltuhr(xml_path, out_path, day_plans, weekend):
+    # z1_fg311.xml with switching points in its StandardTagesplan "Default",
+    # an extra day plan and that plan on Sa / So in the StandardWochenplan
+    from xml_parser import NS
+    ET.register_namespace('', NS[1:-1])
+    tree = ET.parse(xml_path)
+    root = tree.getroot()
+    day_plan_list = root.find(f'.//{NS}TagesplanListe')
+    for name, points in day_plans.items():
+        plan = next((plan for plan in day_plan_list if plan.findtext(NS + 'Bezeichnung') == name), None)
+        if plan is None:
+            plan = ET.SubElement(day_plan_list, NS + 'StandardTagesplan')
+            ET.SubElement(plan, NS + 'Bezeichnung').text = name
+        for fields in points:
+            point = ET.SubElement(plan, NS + 'Schaltpunkt')
+            for field, value in fields.items():
+                ET.SubElement(point, NS + field).text = value
+    week_plan = root.find(f'.//{NS}WochenplanListe/{NS}StandardWochenplan')
+    for day in ('Sa', 'So'):
+        week_plan.find(f'{NS}Tagesplan_{day}').text = weekend
+    tree.write(out_path, encoding='utf-8', xml_declaration=True)
+    return out_path
+
+
+def test_schaltuhr_in_the_export_layout(xml_path, tmp_path):
+    from xml_parser import parse_xml
+    path = export_with_schaltuhr(xml_path, str(tmp_path / 'schaltuhr.xml'), {
+        'Default': [{'ObjNr': '1', 'Zeitpunkt': '06:00:00', 'Signalprogramm': '4'},
+                    {'ObjNr': '2', 'Stunde': '21', 'Minute': '30', 'SigProg': 'STP_(3-4-1)'}],
+        'Wochenende': [{'ObjNr': '1', 'Uhrzeit': '09:00', 'Signalprogramm': '7'}],
+    }, weekend='Wochenende')
+    data = parse_xml(path)
+    schedule = compile_week_schedule(data)
+
+    assert schedule[:2] == [(6 * 3600, 'STP_(1-5-4)'), (21 * 3600 + 1800, 'STP_(3-4-1)')]
+    assert schedule[10:] == [(5 * DAY + 9 * 3600, 'STP_(3-4-1)'), (6 * DAY + 9 * 3600, 'STP_(3-4-1)')]
+    assert program_at(schedule, 5 * DAY + 8 * 3600) == 'STP_(3-4-1)'  # Friday evening's program
+
+
+def test_invalid_schaltuhr_in_the_export_layout_raises(xml_path, tmp_path):
+    from xml_parser import parse_xml
+    path = export_with_schaltuhr(xml_path, str(tmp_path / 'schaltuhr.xml'), {
+        'Default': [{'ObjNr': '1', 'Zeitpunkt': '6 Uhr', 'Signalprogramm': '4'}],
+    }, weekend='Default')
+    with pytest.raises(ScheduleError):
+        compile_week_schedule(parse_xml(path))
@@ -0,0 +1,71 @@
+import asyncio
+
+from async_runtime import ControllerRuntime
+from main import Controller
+from state_stream import StateStreamClient, StateStreamServer, _Client
+
+
+def make_runtime(data, count, tick):
+    runtime = ControllerRuntime(tick=tick)
+    for i in range(count):
+        controller = Controller(data, gui=False)
+        controller.verbose = False
+        runtime.add(controller, name=f"311-{i + 1}")
+    return runtime
+
+
+def test_stream_states_and_commands(data, tmp_path):
+    runtime = make_runtime(data, 2, tick=0.01)
+    server = StateStreamServer(runtime)
+    path = str(tmp_path / 'stream.sock')
+    program = list(data['programs'])[1]
+
+    async def session():
+        tasks = [asyncio.ensure_future(runtime.run_controller(name)) for name in runtime.controllers]
+        tasks.append(asyncio.ensure_future(server.serve(path=path)))
+        while not (tmp_path / 'stream.sock').exists():
+            await asyncio.sleep(0.01)
+        client = StateStreamClient()
+        await client.connect(path=path)
+        assert [intersection['name'] for intersection in client.intersections] == ['311-1', '311-2']
+
+        states = {}
+        replies = []
+        client.send(f"311-2 {program}")
+        async for kind, message in client.messages():
+            if kind == 'reply':
+                replies.append(message)
+            else:
+                for name, frame_program, frame in message:
+                    states[name] = (frame_program, bytes(frame.state))
+            if replies and states.get('311-2', (None,))[0] == program:
+                break  # The switch was executed and streamed back
+        client.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return states, replies
+
+    states, replies = asyncio.run(asyncio.wait_for(session(), 10))
+    assert replies == [f"\U00002713 311-2: switch to {program} requested"]
+    assert states['311-1'][0] == list(data['programs'])[0]
+    assert all(len(state) == len(data['signals']) for _, state in states.values())
+
+
+def test_slow_client_frames_are_coalesced(data):
+    runtime = make_runtime(data, 1, tick=1.0)
+    server = StateStreamServer(runtime)
+    controller = runtime.controllers['311-1']
+
+    async def ticks():
+        client = _Client(writer=None)  # Never sends: every frame waits
+        server.clients.add(client)
+        for step in range(1, 200):
+            controller.advance(step)
+            server.collect()
+        return client
+
+    client = asyncio.run(ticks())
+    assert len(client.pending) == 1  # Only the latest frame of the intersection
+    assert client.coalesced > 0
+    assert bytes(client.pending[0][-len(controller.state):]) == bytes(controller.state)
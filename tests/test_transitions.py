@@ -0,0 +1,9 @@
+from transitions import MIN_CLEARANCE, compile_transition
+
+
+def test_no_all_red_when_no_signal_ends_its_green(data):
+    same_stage = compile_transition(data, 3, 3)
+    assert (same_stage['duration'], same_stage['phases'], same_stage['schedule']) == (0, [], [])
+    # Stage 5 → 3 only starts the F3 crossing
+    assert compile_transition(data, 4, 2)['phases'] == []
+    assert compile_transition(data, 0, 2)['clearance'] >= MIN_CLEARANCE
@@ -0,0 +1,22 @@
+import xml.etree.ElementTree as ET
+
+import xml_parser
+
+
+def test_parse_leaves_no_element_attached(monkeypatch, xml_path):
+    # Every ended element is cleared and detached, handled or not: only the
+    # root is left once the export is read
+    roots = []
+    iterparse = ET.iterparse
+
+    def recording_iterparse(*args, **kwargs):
+        for event, elem in iterparse(*args, **kwargs):
+            if not roots:
+                roots.append(elem)
+            yield event, elem
+
+    monkeypatch.setattr(xml_parser.ET, 'iterparse', recording_iterparse)
+    data = xml_parser.parse_xml(xml_path)
+
+    assert data['stages'] and data['programs'] and data['conflict_masks']
+    assert [elem.tag for elem in roots[0].iter()] == [roots[0].tag]
@@ -0,0 +1,116 @@
+# Bucket upper bounds in seconds (10 µs ... 1 s, then overflow)
+BUCKETS = [10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6,
+           1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3, 200e-3, 500e-3, 1.0, float('inf')]
+
+
+def _format(seconds):
+    if seconds == float('inf'):
+        return ">1s"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}µs"
+    return f"{seconds * 1e3:.2f}ms"
+
+
+class Histogram:
+    # Fixed log-spaced buckets: recording scans a short list and allocates
+    # nothing, so it can stay on in production
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        # Upper bound of the bucket holding the p-th percentile
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return BUCKETS[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'buckets': {_format(bound): count for bound, count in zip(BUCKETS, self.counts) if count},
+        }
+
+    def describe(self):
+        if not self.count:
+            return "-"
+        return (f"p50 ≤{_format(self.percentile(50))}  p99 ≤{_format(self.percentile(99))}  "
+                f"max {_format(self.max)}  (n={self.count})")
+
+
+class TickStats:
+    # Real-time compliance of a tick loop scheduled on absolute deadlines:
+    #   latency  - wake-up time after the tick's deadline
+    #   jitter   - deviation of the interval between two wake-ups from the tick
+    #   work     - controller processing per tick (advance), without transition starts
+    #   transitions - processing of ticks that compiled/started a transition
+    #   overruns - ticks that finished after the next tick's deadline
+    def __init__(self, tick=1.0):
+        self.tick = tick
+        self.latency = Histogram()
+        self.jitter = Histogram()
+        self.work = Histogram()
+        self.transitions = Histogram()
+        self.overruns = 0
+        self.ticks = 0
+        self._last_wake = {}  # Tick loop (source) -> its previous wake-up
+
+    def record_tick(self, deadline, woke, done, source=None):
+        # source tells apart several tick loops sharing these stats
+        self.ticks += 1
+        self.latency.record(max(0.0, woke - deadline))
+        last_wake = self._last_wake.get(source)
+        if last_wake is not None:
+            self.jitter.record(abs(woke - last_wake - self.tick))
+        self._last_wake[source] = woke
+        if done > deadline + self.tick:
+            self.overruns += 1
+
+    def record_work(self, seconds, transition=False):
+        (self.transitions if transition else self.work).record(seconds)
+
+    def summary(self):
+        return {
+            'tick': self.tick,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'latency': self.latency.summary(),
+            'jitter': self.jitter.summary(),
+            'work': self.work.summary(),
+            'transitions': self.transitions.summary(),
+        }
+
+    def report(self):
+        lines = [
+            f"TICK TIMING: {self.ticks} ticks @ {self.tick:g}s, {self.overruns} overruns",
+            f"  latency:     {self.latency.describe()}",
+            f"  jitter:      {self.jitter.describe()}",
+            f"  work:        {self.work.describe()}",
+            f"  transitions: {self.transitions.describe()}",
+        ]
+        return "\n".join(lines)
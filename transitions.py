@@ -0,0 +1,142 @@
+from signal_util import OCIT
+
+GREEN = 'gruen'
+RED = 'rot'
+AMBER = 'gelb'
+RED_AMBER = 'rotgelb'
+
+MIN_CLEARANCE = 2  # All-red phase after a termination lasts at least 2 seconds
+
+# Used when the XML does not define Uebergangselemente for a signal group
+DEFAULT_ELEMENTS = {
+    (GREEN, RED): [('gelb', 3)],  # Termination: GREEN → YELLOW → RED
+    (RED, GREEN): [('rotgelb', 1)],  # Initiation: RED → RED-YELLOW → GREEN
+}
+
+
+def transition_elements(data, signal, old_color, new_color):
+    groups = data.get('signal_groups', {})
+    if signal in groups:
+        return groups[signal]['transitions'].get((old_color, new_color), [])
+    return DEFAULT_ELEMENTS.get((old_color, new_color), [])
+
+
+def compile_transition(data, from_idx, to_idx, name=None, allowed=True):
+    transition = compile_state_transition(
+        data, data['stages'][from_idx]['signals'], data['stages'][to_idx]['signals'],
+        name or f"{data['stages'][from_idx]['name']} → {data['stages'][to_idx]['name']}", allowed)
+    transition['from'] = from_idx
+    transition['to'] = to_idx
+    return transition
+
+
+def compile_state_transition(data, old_signals, new_signals, name, allowed=True, green_time=None):
+    # Transition between two arbitrary signal pictures ({signal: color});
+    # 'from'/'to' are None unless both are stages (see compile_transition).
+    # A picture taken from a running plan can hold amber and red-amber heads:
+    # amber completes its termination, red-amber its initiation. green_time
+    # ({signal: seconds}) is how long the green heads have shown green; they
+    # end no earlier than their minimum green.
+    intergreens = data['intergreen_times']
+    groups = data.get('signal_groups', {})
+    green_time = green_time or {}
+
+    ending = []    # (signal, hold, elements, final color) for signals leaving green
+    starting = []  # (signal, elements) for signals entering green
+    others = []    # (signal, final color) for changes not involving green
+    greening = []  # Red-amber signals turning green at once
+    for signal, new_color in new_signals.items():
+        old_color = old_signals.get(signal)
+        if old_color == new_color:
+            continue
+        min_green = groups.get(signal, {}).get('min_green') or 0
+        if old_color == AMBER:
+            # Already terminating: keeps amber for a full termination, then red
+            hold = sum(d for _, d in transition_elements(data, signal, GREEN, RED))
+            ending.append((signal, hold, [], RED))
+            if new_color == GREEN:
+                starting.append((signal, transition_elements(data, signal, RED, GREEN)))
+            elif new_color != RED:
+                others.append((signal, new_color))
+            continue
+        if old_color == RED_AMBER:
+            greening.append(signal)
+            if new_color == GREEN:
+                continue
+            # Ends again after its minimum green
+            ending.append((signal, min_green, transition_elements(data, signal, GREEN, new_color), new_color))
+            continue
+        elements = transition_elements(data, signal, old_color, new_color)
+        if old_color == GREEN:
+            hold = max(0, min_green - green_time[signal]) if signal in green_time else 0
+            ending.append((signal, hold, elements, new_color))
+        elif new_color == GREEN:
+            starting.append((signal, elements))
+        else:
+            others.append((signal, new_color))
+
+    yellow = max([hold + sum(d for _, d in elements) for _, hold, elements, _ in ending], default=0)
+    red_yellow = max([sum(d for _, d in elements) for _, elements in starting], default=0)
+
+    max_clearance = 0
+    for from_signal, _, _, _ in ending:
+        for to_signal, _ in starting:
+            max_clearance = max(max_clearance, intergreens.get(from_signal, {}).get(to_signal, 0))
+    # Nothing to clear when no signal ends its green (e.g. into the same stage)
+    all_red = max(max_clearance, MIN_CLEARANCE) if ending else 0
+
+    # Events are (offset, signal slot, OCIT code) in the layout of data['signals']
+    slot = data['signal_index']
+    code = OCIT.nameToByte
+    green_start = yellow + all_red + red_yellow
+    schedule = []
+    for signal in greening:
+        schedule.append((0, slot[signal], code[GREEN]))
+    for signal, hold, elements, final_color in ending:
+        offset = hold
+        for color, duration in elements:
+            schedule.append((offset, slot[signal], code[color]))
+            offset += duration
+        schedule.append((offset, slot[signal], code[final_color]))
+    for signal, elements in starting:
+        offset = green_start - sum(d for _, d in elements)
+        for color, duration in elements:
+            schedule.append((offset, slot[signal], code[color]))
+            offset += duration
+        schedule.append((green_start, slot[signal], code[GREEN]))
+    for signal, final_color in others:
+        schedule.append((green_start, slot[signal], code[final_color]))
+    schedule.sort(key=lambda event: event[0])
+
+    phases = []  # (phase, start offset, end offset)
+    start = 0
+    for phase, duration in (('yellow', yellow), ('all_red', all_red), ('red_yellow', red_yellow)):
+        if duration > 0:
+            phases.append((phase, start, start + duration))
+            start += duration
+
+    return {
+        'name': name,
+        'from': None,
+        'to': None,
+        'allowed': allowed,
+        'duration': green_start,
+        'clearance': all_red,
+        'phases': phases,
+        'schedule': schedule,
+        'changing': list(dict.fromkeys([slot[signal] for signal in greening] + [slot[signal] for signal, _, _, _ in ending]
+                                       + [slot[signal] for signal, _ in starting] + [slot[signal] for signal, _ in others])),
+    }
+
+
+def compile_transition_table(data):
+    stage_index = {stage['name']: idx for idx, stage in enumerate(data['stages'])}
+
+    table = {}
+    for transition in data.get('stage_transitions', []):
+        from_idx = stage_index.get(transition['from'])
+        to_idx = stage_index.get(transition['to'])
+        if from_idx is None or to_idx is None or from_idx == to_idx or (from_idx, to_idx) in table:
+            continue
+        table[(from_idx, to_idx)] = compile_transition(data, from_idx, to_idx, name=transition['name'])
+    return table
@@ -1,60 +1,324 @@
-  tree = ET.parse(file_path)
-    root = tree.getroot()
-    ns = {'ns': 'http://www.schlothauer.de/OMTC/LStg_Versorgung'}
-    
+import xml.etree.ElementTree as ET
+from array import array
+
+from signal_util import OCIT
+from transitions import compile_transition_table
+from signal_plans import compile_signal_plans
+
+# Streaming LISA loader: one iterparse pass over the export. Each record
+# (Phase, Signalprogramm, Signalgruppe, ZwiZt, DigEingang, ...) is read when
+# its end tag arrives and then cleared and detached. Every other element is
+# cleared and detached at its end tag too, unless it belongs to a record still
+# being read, so memory stays bounded by the largest single record instead of
+# the whole document, including the subtrees the loader does not use.
+
+NS = '{http://www.schlothauer.de/OMTC/LStg_Versorgung}'
+
+KOPFDATEN = NS + 'Kopfdaten'
+PHASE = NS + 'Phase'
+PHASENUEBERGANG = NS + 'Phasenuebergang'
+PHASENUEBERGANGSMATRIX = NS + 'Phasenuebergangsmatrix'
+UEBERGANG = NS + 'Uebergang'
+SIGNALGRUPPE_LISTE = NS + 'SignalgruppeListe'
+SIGNALGRUPPE = NS + 'Signalgruppe'
+SIGNALPROGRAMM = NS + 'Signalprogramm'
+ZWISCHENZEITENMATRIX = NS + 'SicherheitsZwischenzeitenmatrix'
+ZWIZT = NS + 'ZwiZt'
+DIGEINGANG = NS + 'DigEingang'
+DETPARASATZ = NS + 'DetParaSatz'
+TAGESPLAN_LISTE = NS + 'TagesplanListe'
+WOCHENPLAN_LISTE = NS + 'WochenplanListe'
+UNVERTRAEGLICHKEITSMATRIX = NS + 'Unvertraeglichkeitsmatrix'
+FEIND = NS + 'Feind'
+
+RECORDS = {PHASE, SIGNALPROGRAMM, ZWIZT, PHASENUEBERGANG, DIGEINGANG, DETPARASATZ, KOPFDATEN}
+
+PLAN_META = {NS + 'Bezeichnung', NS + 'ObjNr', NS + 'LetzteAenderung'}
+
+
+def _text(element, name, default=None):
+    return element.findtext(NS + name, default)
+
+
+def _int(value, default=0):
+    return int(float(value)) if value not in (None, '') else default
+
+
+def _bool(value):
+    return value == 'true'
+
+
+def _local(tag):
+    return tag[len(NS):] if tag.startswith(NS) else tag
+
+
+def _is_record(tag, parent):
+    # Elements read by a handler at their end tag; decided at the start tag too
+    parent_tag = parent.tag if parent is not None else None
+    return (tag in RECORDS
+            or (tag == SIGNALGRUPPE and parent_tag == SIGNALGRUPPE_LISTE)
+            or (tag == UEBERGANG and parent_tag == PHASENUEBERGANGSMATRIX)
+            or (tag == FEIND and parent_tag == UNVERTRAEGLICHKEITSMATRIX)
+            or parent_tag in (TAGESPLAN_LISTE, WOCHENPLAN_LISTE))
+
+
+def parse_xml(file_path):
     data = {
+        'node': {},
         'stages': [],
         'programs': {},
-        'intergreen_times': {}
+        'program_info': {},
+        'switching_times': {},
+        'intergreen_times': {},
+        'conflicts': [],
+        'signal_groups': {},
+        'stage_transitions': [],
+        'detectors': [],
+        'detector_parameters': {},
+        'day_plans': {},
+        'week_plans': {},
     }
-    
-    phases = root.findall('.//ns:Phase', ns)
-    for phase in phases:
-        stage_name = phase.findtext('ns:Bezeichnung', namespaces=ns)
-        signals = {}
-        
-        elements = phase.findall('ns:PhasenElementeintrag', ns)
-        for element in elements:
-            signal = element.findtext('ns:Signalgruppe', namespaces=ns)
-            state = element.findtext('ns:Signalbild', namespaces=ns)
-            if signal and state:
-                signals[signal] = state
-        
-        if signals:
-            data['stages'].append({'name': stage_name, 'signals': signals})
-    
-    programs = root.findall('.//ns:Signalprogramm', ns)
-    for program in programs:
-        name = program.findtext('ns:Bezeichnung', namespaces=ns)
-        timings = {}
-        
-        rows = program.findall('ns:SPZeile', ns)
-        for row in rows:
-            signal = row.findtext('ns:Signalgruppe', namespaces=ns)
-            if not signal:
-                continue
-            
-            switches = row.findall('ns:Schaltzeit', ns)
-            for switch in switches:
-                if switch.findtext('ns:ZielSignalbild', namespaces=ns) == 'gruen':
-                    time_point = switch.findtext('ns:Schaltzeitpunkt', namespaces=ns)
-                    if time_point:
-                        timings[signal] = int(float(time_point))
-                    break
-        
-        data['programs'][name] = timings
-    
-    matrix = root.find('.//ns:SicherheitsZwischenzeitenmatrix', ns)
-    if matrix:
-        entries = matrix.findall('ns:ZwiZt', ns)
-        for entry in entries:
-            from_sig = entry.findtext('ns:Raeumer', namespaces=ns)
-            to_sig = entry.findtext('ns:Einfahrer', namespaces=ns)
-            time_val = entry.findtext('ns:T', namespaces=ns)
-            
-            if from_sig and to_sig and time_val:
-                if from_sig not in data['intergreen_times']:
-                    data['intergreen_times'][from_sig] = {}
-                data['intergreen_times'][from_sig][to_sig] = int(float(time_val))
-    
-    return data
\ No newline at end of file
+    named_transitions = []
+    matrix_transitions = []
+    intergreen_matrices = 0  # Only the first SicherheitsZwischenzeitenmatrix is used
+
+    stack = []  # (element, is a record) of the open elements
+    open_records = 0  # Records whose end tag has not arrived; their subtrees are kept
+    for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+        if event == 'start':
+            # Inside a record, nothing is a record of its own (e.g. the
+            # Signalprogramm field of a day plan switching point)
+            record = not open_records and _is_record(elem.tag, stack[-1][0] if stack else None)
+            open_records += record
+            stack.append((elem, record))
+            continue
+        _, record = stack.pop()
+        parent = stack[-1][0] if stack else None
+        tag = elem.tag
+
+        if not record:
+            if tag == ZWISCHENZEITENMATRIX:
+                intergreen_matrices += 1
+            if open_records:
+                continue  # Part of a record still being read
+        else:
+            open_records -= 1
+            _read_record(elem, tag, parent, data, named_transitions, matrix_transitions, intergreen_matrices)
+
+        elem.clear()
+        if parent is not None:
+            parent.remove(elem)
+
+    # Named Phasenuebergang entries win over bare matrix entries for the same pair
+    known = set()
+    for transition in named_transitions + matrix_transitions:
+        key = (transition['from'], transition['to'])
+        if key not in known:
+            known.add(key)
+            data['stage_transitions'].append(transition)
+
+    _compile_signal_layout(data)
+    data['transition_table'] = compile_transition_table(data)
+    data['signal_plans'] = compile_signal_plans(data)
+
+    return data
+
+
+def _read_record(elem, tag, parent, data, named_transitions, matrix_transitions, intergreen_matrices):
+    if tag == PHASE:
+        _read_phase(elem, data)
+    elif tag == SIGNALPROGRAMM:
+        _read_program(elem, data)
+    elif tag == ZWIZT:
+        if intergreen_matrices == 0:
+            _read_intergreen(elem, data)
+    elif tag == SIGNALGRUPPE and parent is not None and parent.tag == SIGNALGRUPPE_LISTE:
+        _read_signal_group(elem, data)
+    elif tag == PHASENUEBERGANG:
+        named_transitions.append({'name': _text(elem, 'Bezeichnung'), 'from': _text(elem, 'Startphase'), 'to': _text(elem, 'Zielphase')})
+    elif tag == UEBERGANG and parent is not None and parent.tag == PHASENUEBERGANGSMATRIX:
+        matrix_transitions.append({'name': None, 'from': _text(elem, 'VonPhase'), 'to': _text(elem, 'NachPhase')})
+    elif tag == FEIND and parent is not None and parent.tag == UNVERTRAEGLICHKEITSMATRIX:
+        pair = (_text(elem, 'SGr1'), _text(elem, 'SGr2'))
+        if all(pair):
+            data['conflicts'].append(pair)
+    elif tag == DIGEINGANG:
+        _read_detector(elem, data)
+    elif tag == DETPARASATZ:
+        _read_detector_parameters(elem, data)
+    elif parent is not None and parent.tag == TAGESPLAN_LISTE:
+        _read_day_plan(elem, data)
+    elif parent is not None and parent.tag == WOCHENPLAN_LISTE:
+        _read_week_plan(elem, data)
+    elif tag == KOPFDATEN:
+        data['node'] = {
+            'name': _text(elem, 'Name'),
+            'number': _int(elem.findtext(f'.//{NS}KnotenNummer')),
+            'city': elem.findtext(f'.//{NS}Stadt'),
+        }
+
+
+def _read_phase(phase, data):
+    signals = {}
+    for element in phase.iterfind(NS + 'PhasenElementeintrag'):
+        signal = _text(element, 'Signalgruppe')
+        state = _text(element, 'Signalbild')
+        if signal and state:
+            signals[signal] = state
+    if signals:
+        data['stages'].append({'name': _text(phase, 'Bezeichnung'), 'signals': signals})
+
+
+def _read_program(program, data):
+    name = _text(program, 'Bezeichnung')
+    timings = {}  # First green switching time per signal group
+    switching_times = {}  # All (time, target picture) per signal group
+    for row in program.iterfind(NS + 'SPZeile'):
+        signal = _text(row, 'Signalgruppe')
+        if not signal:
+            continue
+        points = []
+        for switch in row.iterfind(NS + 'Schaltzeit'):
+            time_point = _text(switch, 'Schaltzeitpunkt')
+            target = _text(switch, 'ZielSignalbild')
+            if time_point and target:
+                points.append((_int(time_point), target))
+                if target == 'gruen' and signal not in timings:
+                    timings[signal] = _int(time_point)
+        switching_times[signal] = points
+
+    data['programs'][name] = timings
+    data['switching_times'][name] = switching_times
+    data['program_info'][name] = {
+        'number': _int(_text(program, 'ObjNr')),
+        'cycle_time': _int(_text(program, 'TU')),
+        'offset': _int(_text(program, 'SignalzeitenVersatz')),
+        'fixed_time': _bool(program.findtext(f'{NS}Typ/{NS}FZ')),
+        'actuated': _bool(program.findtext(f'{NS}Typ/{NS}VA')),
+        'detector_parameters': _text(program, 'DetParameter'),
+    }
+
+
+def _read_intergreen(entry, data):
+    from_sig = _text(entry, 'Raeumer')
+    to_sig = _text(entry, 'Einfahrer')
+    time_val = _text(entry, 'T')
+    if from_sig and to_sig and time_val:
+        data['intergreen_times'].setdefault(from_sig, {})[to_sig] = _int(time_val)
+
+
+def _read_transition_elements(transition):
+    elements = []
+    if transition is not None:
+        for element in transition.iterfind(NS + 'Uebergangselement'):
+            color = _text(element, 'Signalbild')
+            duration = _text(element, 'Zeitdauer')
+            if color and duration:
+                elements.append((color, _int(duration)))
+    return elements
+
+
+def _read_signal_group(group, data):
+    name = _text(group, 'Bezeichnung')
+    transitions = {}
+    for extra in group.iterfind(NS + 'ZusatzUebergang'):
+        key = (_text(extra, 'StartFarbbild'), _text(extra, 'ZielFarbbild'))
+        if key not in transitions:
+            transitions[key] = _read_transition_elements(extra.find(NS + 'Uebergang'))
+
+    # Standard termination / initiation take precedence over the extra transitions
+    abwurf = group.find(NS + 'AbwurfUebergang')
+    if abwurf is not None:
+        transitions[('gruen', 'rot')] = _read_transition_elements(abwurf)
+    anwurf = group.find(NS + 'AnwurfUebergang')
+    if anwurf is not None:
+        transitions[('rot', 'gruen')] = _read_transition_elements(anwurf)
+
+    if name:
+        data['signal_groups'][name] = {
+            'transitions': transitions,
+            'min_green': _int(_text(group, 'MinFrei')),
+            'min_red': _int(_text(group, 'MinGesperrt')),
+        }
+
+
+def _read_detector(detector, data):
+    data['detectors'].append({
+        'name': _text(detector, 'Bezeichnung'),
+        'id': _int(_text(detector, 'ObjNr')),
+        'signal_group': _text(detector, 'ZugeordneteSignalgruppe'),
+        'type': _text(detector, 'Bauart'),
+        'debounce': _int(_text(detector, 'Prellzeit')),
+        'clear_seconds': _int(_text(detector, 'LoeschSekunde')),
+        'min_occupancy': _int(_text(detector, 'MinBelegungAnfo')),
+    })
+
+
+def _read_detector_parameters(parameter_set, data):
+    parameters = {}
+    for entry in parameter_set.iterfind(NS + 'DetektorParameter'):
+        values = {_local(child.tag): child.text for child in entry}
+        detector = values.pop('Detektor', None)
+        if detector:
+            parameters[detector] = values
+    data['detector_parameters'][_text(parameter_set, 'Bezeichnung')] = parameters
+
+
+def _read_day_plan(plan, data):
+    # Switching entries are kept as {field: text} for the scheduler to interpret
+    entries = []
+    for entry in plan:
+        if entry.tag not in PLAN_META and len(entry):
+            entries.append({_local(child.tag): child.text for child in entry})
+    data['day_plans'][_text(plan, 'Bezeichnung')] = entries
+
+
+def _read_week_plan(plan, data):
+    days = {}
+    for child in plan:
+        if _local(child.tag).startswith('Tagesplan_'):
+            days[_local(child.tag)[len('Tagesplan_'):]] = child.text
+    data['week_plans'][_text(plan, 'Bezeichnung')] = days
+
+
+def _compile_signal_layout(data):
+    # Intern signal groups as integer slots; stage states and the intergreen
+    # matrix become dense arrays indexed by slot, colours become OCIT codes
+    signals = []
+    for stage in data['stages']:
+        for signal in stage['signals']:
+            if signal not in signals:
+                signals.append(signal)
+    index = {signal: slot for slot, signal in enumerate(signals)}
+
+    data['signals'] = signals
+    data['signal_index'] = index
+    data['stage_states'] = [
+        array('B', [OCIT.nameToByte[stage['signals'].get(signal, 'dunkel')] for signal in signals])
+        for stage in data['stages']
+    ]
+
+    n = len(signals)
+    matrix = array('h', [-1]) * (n * n)  # -1: no intergreen defined
+    for from_sig, row in data['intergreen_times'].items():
+        for to_sig, time_val in row.items():
+            if from_sig in index and to_sig in index:
+                matrix[index[from_sig] * n + index[to_sig]] = time_val
+    data['intergreen_matrix'] = matrix
+
+    # Conflict matrix as one bitmask per slot: bit j of conflict_masks[i] set
+    # when signal groups i and j must never show green together
+    masks = [0] * n
+    for first, second in data['conflicts']:
+        if first in index and second in index:
+            masks[index[first]] |= 1 << index[second]
+            masks[index[second]] |= 1 << index[first]
+    data['conflict_masks'] = masks
+
+
+if __name__ == '__main__':
+    data = parse_xml('z1_fg311.xml')
+    print(f"Node {data['node'].get('number')}: {len(data['stages'])} stages, {len(data['programs'])} programs, "
+          f"{len(data['signals'])} signal groups, {len(data['detectors'])} detectors, {len(data['conflicts'])} conflicts")
+    for name, info in data['program_info'].items():
+        print(f"  {name}: TU={info['cycle_time']}s, fixed time={info['fixed_time']}, actuated={info['actuated']}")